@@ -3,12 +3,16 @@
 FPL Optimizer Web Application
 Flask-based web interface for the FPL Optimizer
 """
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, session
 from flask_cors import CORS
-from flask.json.provider import DefaultJSONProvider
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import traceback
-import numpy as np
+import orjson
+import pandas as pd
+from decimal import Decimal
 from fpl_api import FPLApi
 from player_analyzer import PlayerAnalyzer
 from team_optimizer import TeamOptimizer
@@ -17,70 +21,103 @@ from captain_selector import CaptainSelector
 from chip_advisor import ChipAdvisor
 
 
-class NumpyJSONProvider(DefaultJSONProvider):
-    """Custom JSON provider that handles numpy/pandas types"""
-    def default(self, obj):
-        if isinstance(obj, (np.integer, np.int64)):
-            return int(obj)
-        elif isinstance(obj, (np.floating, np.float64)):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return super().default(obj)
-
-
 app = Flask(__name__)
-app.json = NumpyJSONProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'fpl-optimizer-secret-key-2024')
 CORS(app)
 
 # Default team ID
 DEFAULT_TEAM_ID = 7440345
 
-# Global instances (initialized on first request)
+# Global instances (preloaded at startup, otherwise initialized on first request)
 api = None
 analyzer = None
 optimizer = None
 transfer_suggester = None
 captain_selector = None
 chip_advisor = None
+_initialized = False
+_init_lock = threading.Lock()
+
+# Runs the independent analyses of a team-analysis request side by side
+analysis_executor = ThreadPoolExecutor(max_workers=4)
+
 
+# orjson serializes numpy scalars/arrays natively in a single pass
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
 
-def convert_to_native_types(obj):
-    """Recursively convert numpy/pandas types to native Python types"""
-    if isinstance(obj, dict):
-        return {key: convert_to_native_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_native_types(item) for item in obj]
-    elif isinstance(obj, (np.integer, np.int64)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64)):
+
+def json_default(obj):
+    """Convert the few leaf types orjson doesn't handle natively"""
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
         return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif hasattr(obj, 'item'):  # For numpy scalars
+    if hasattr(obj, 'item'):
         return obj.item()
-    return obj
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_response(payload, status: int = 200):
+    """Serialize a payload (which may contain numpy types) into a JSON response"""
+    return app.response_class(
+        orjson.dumps(payload, default=json_default, option=JSON_OPTIONS),
+        status=status,
+        mimetype='application/json'
+    )
+
+
+# Pre-serialized body for load balancer health probes
+HEALTH_BODY = orjson.dumps({'status': 'healthy'})
+
+
+@lru_cache(maxsize=None)
+def render_static(template_name: str, **context) -> str:
+    """Render a page that doesn't depend on the request once and reuse the HTML"""
+    return render_template(template_name, **context)
+
+
+def _build_components(api: FPLApi):
+    """Load fresh data and build the analysis components on top of it"""
+    analyzer = PlayerAnalyzer(api)
+    analyzer.load_data()
+    optimizer = TeamOptimizer(api, analyzer)
+    transfer_suggester = TransferSuggester(api, analyzer, optimizer)
+    captain_selector = CaptainSelector(api, analyzer)
+    chip_advisor = ChipAdvisor(api, analyzer, transfer_suggester, captain_selector)
+    return analyzer, optimizer, transfer_suggester, captain_selector, chip_advisor
 
 
-def initialize_components():
-    """Initialize all FPL components"""
+def initialize_components(force_refresh: bool = False):
+    """Initialize all FPL components, or reload their data when force_refresh is set"""
     global api, analyzer, optimizer, transfer_suggester, captain_selector, chip_advisor
+    global _initialized
     
-    if api is None:
-        api = FPLApi()
-        analyzer = PlayerAnalyzer(api)
-        analyzer.load_data()
-        optimizer = TeamOptimizer(api, analyzer)
-        transfer_suggester = TransferSuggester(api, analyzer, optimizer)
-        captain_selector = CaptainSelector(api, analyzer)
-        chip_advisor = ChipAdvisor(api, analyzer, transfer_suggester, captain_selector)
+    # Fast path: no locking once everything is set up
+    if _initialized and not force_refresh:
+        return
+    
+    with _init_lock:
+        if not _initialized:
+            api = FPLApi()
+            analyzer, optimizer, transfer_suggester, captain_selector, chip_advisor = (
+                _build_components(api)
+            )
+            _initialized = True
+        elif force_refresh:
+            # Requests in flight keep using the old components; new requests
+            # pick up the rebuilt set once it is swapped in
+            api.invalidate()
+            analyzer, optimizer, transfer_suggester, captain_selector, chip_advisor = (
+                _build_components(api)
+            )
 
 
 @app.route('/')
 def index():
     """Home page"""
-    return render_template('index.html', default_team_id=DEFAULT_TEAM_ID)
+    return render_static('index.html', default_team_id=DEFAULT_TEAM_ID)
 
 
 @app.route('/dashboard')
@@ -93,32 +130,33 @@ def dashboard():
 @app.route('/optimal-squad')
 def optimal_squad_page():
     """Optimal squad builder page"""
-    return render_template('optimal_squad.html')
+    return render_static('optimal_squad.html')
 
 
 @app.route('/value-players')
 def value_players_page():
     """Value players page"""
-    return render_template('value_players.html')
+    return render_static('value_players.html')
 
 
 # API Routes
 @app.route('/api/initialize', methods=['POST'])
 def api_initialize():
-    """Initialize the FPL data"""
+    """Initialize the FPL data (pass {"refresh": true} to reload it)"""
     try:
-        initialize_components()
+        data = request.get_json(silent=True) or {}
+        initialize_components(force_refresh=bool(data.get('refresh')))
         current_gw = api.get_current_gameweek()
-        return jsonify({
+        return json_response({
             'success': True,
             'current_gameweek': current_gw,
             'message': 'Data loaded successfully'
         })
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/optimal-squad', methods=['POST'])
@@ -131,13 +169,12 @@ def api_optimal_squad():
         budget = data.get('budget', 1000)
         
         result = optimizer.optimize_squad(budget=budget, horizon=horizon)
-        result = convert_to_native_types(result)
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/api/team-analysis/<int:team_id>', methods=['GET'])
@@ -146,22 +183,29 @@ def api_team_analysis(team_id):
     try:
         initialize_components()
         
+        # Fetch team info while the current squad is loaded
+        team_info_future = api.executor.submit(api.get_team, team_id)
+        
         # Get current squad
-        current_gw = api.get_current_gameweek()
-        picks_data = api.get_team_picks(team_id, current_gw)
+        current_gw, picks_data = api.prefetch_squad(team_id)
         current_squad = [pick['element'] for pick in picks_data['picks']]
         
-        # Get all analyses
-        lineup = optimizer.optimize_starting_xi(current_squad)
-        transfers = transfer_suggester.suggest_transfers(team_id, num_transfers=1, horizon=5)
-        captain = captain_selector.suggest_captain(current_squad)
-        chips = chip_advisor.get_chip_recommendations(team_id)
+        # Run all analyses concurrently
+        lineup_future = analysis_executor.submit(optimizer.optimize_starting_xi, current_squad)
+        transfers_future = analysis_executor.submit(
+            transfer_suggester.suggest_transfers, team_id, num_transfers=1, horizon=5,
+            picks_data=picks_data
+        )
+        captain_future = analysis_executor.submit(captain_selector.suggest_captain, current_squad)
+        chips_future = analysis_executor.submit(chip_advisor.get_chip_recommendations, team_id)
         
-        # Get team info
-        team_info = api.get_team(team_id)
+        lineup = lineup_future.result()
+        transfers = transfers_future.result()
+        captain = captain_future.result()
+        chips = chips_future.result()
+        team_info = team_info_future.result()
         
-        # Convert all data to native types
-        result = convert_to_native_types({
+        result = {
             'success': True,
             'team_info': {
                 'name': team_info.get('name', 'Your Team'),
@@ -175,15 +219,15 @@ def api_team_analysis(team_id):
             'captain': captain,
             'chips': chips,
             'current_gameweek': current_gw
-        })
+        }
         
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/api/transfers/<int:team_id>', methods=['POST'])
@@ -200,13 +244,12 @@ def api_transfers(team_id):
             num_transfers=num_transfers, 
             horizon=horizon
         )
-        result = convert_to_native_types(result)
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/api/captain/<int:team_id>', methods=['GET'])
@@ -215,18 +258,16 @@ def api_captain(team_id):
     try:
         initialize_components()
         
-        current_gw = api.get_current_gameweek()
-        picks_data = api.get_team_picks(team_id, current_gw)
+        current_gw, picks_data = api.prefetch_squad(team_id)
         current_squad = [pick['element'] for pick in picks_data['picks']]
         
         result = captain_selector.suggest_captain(current_squad)
-        result = convert_to_native_types(result)
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/api/chips/<int:team_id>', methods=['GET'])
@@ -235,13 +276,12 @@ def api_chips(team_id):
     try:
         initialize_components()
         result = chip_advisor.get_chip_recommendations(team_id)
-        result = convert_to_native_types(result)
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/api/lineup/<int:team_id>', methods=['GET'])
@@ -250,18 +290,16 @@ def api_lineup(team_id):
     try:
         initialize_components()
         
-        current_gw = api.get_current_gameweek()
-        picks_data = api.get_team_picks(team_id, current_gw)
+        current_gw, picks_data = api.prefetch_squad(team_id)
         current_squad = [pick['element'] for pick in picks_data['picks']]
         
         result = optimizer.optimize_starting_xi(current_squad)
-        result = convert_to_native_types(result)
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/api/value-players', methods=['GET'])
@@ -275,29 +313,33 @@ def api_value_players():
         
         result = analyzer.get_value_players(position=position, limit=limit)
         
-        # Convert DataFrame to dict and ensure native types
         players = result.to_dict('records')
-        players = convert_to_native_types(players)
         
-        return jsonify({
+        return json_response({
             'success': True,
             'players': players
         })
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()
-        }), 500
+        }, 500)
 
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy'})
+    return app.response_class(HEALTH_BODY, mimetype='application/json')
 
 
 if __name__ == '__main__':
+    # Load FPL data before serving so the first request doesn't pay for it
+    try:
+        initialize_components()
+    except Exception as e:
+        print(f"Could not preload FPL data ({e}); it will be loaded on the first request")
+    
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
 
@@ -1,10 +1,51 @@
 """
 Captain Selector - Recommends captain and vice-captain choices
 """
+import numpy as np
 import pandas as pd
+from functools import lru_cache
 from typing import Dict, List, Tuple
 from fpl_api import FPLApi
-from player_analyzer import PlayerAnalyzer
+from player_analyzer import PlayerAnalyzer, top_k_indices
+
+
+# Ceiling multiplier indexed by element_type (attackers have higher ceiling)
+POSITION_CEILING_MULT = np.array([1.0, 1.2, 1.3, 1.5, 1.6])
+
+
+def score_players(
+    element_type: np.ndarray,
+    form: np.ndarray,
+    threat: np.ndarray,
+    expected_points: np.ndarray,
+    minutes: np.ndarray,
+    starts: np.ndarray,
+    clean_sheets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate ceiling and floor for a set of players from flat per-player arrays.
+    
+    Ceiling is the high upside potential: attackers and players in form score higher.
+    Floor is the consistent baseline: high minutes and defensive stats score higher.
+    
+    Returns:
+        Tuple of (ceiling, floor) arrays
+    """
+    # Ceiling: position multiplier, form bonus and normalized threat bonus
+    known_position = (element_type >= 1) & (element_type <= 4)
+    mult = np.where(known_position, np.take(POSITION_CEILING_MULT, element_type, mode='clip'), 1.0)
+    ceiling = expected_points * mult + form * 0.2 + (threat / 100) * 2
+    
+    # Floor: conservative estimate plus minutes consistency
+    has_played = (minutes > 0) & (starts > 0)
+    minutes_ratio = np.divide(minutes, starts * 90, out=np.zeros_like(minutes), where=has_played)
+    floor = expected_points * 0.6 + minutes_ratio * 2
+    
+    # Clean sheet potential for defenders/GK
+    clean_sheet_prob = clean_sheets / np.maximum(starts, 1)
+    floor += np.where((element_type == 1) | (element_type == 2), clean_sheet_prob * 4, 0.0)
+    
+    return ceiling, floor
 
 
 class CaptainSelector:
@@ -13,10 +54,12 @@ class CaptainSelector:
     def __init__(self, api: FPLApi, analyzer: PlayerAnalyzer):
         self.api = api
         self.analyzer = analyzer
+        self._suggest_captain_cached = lru_cache(maxsize=256)(self._suggest_captain)
         
     def suggest_captain(self, squad_player_ids: List[int], num_gameweeks: int = 1) -> Dict:
         """
         Suggest captain and vice-captain from the squad.
+        Results are memoized per squad and gameweek.
         
         Args:
             squad_player_ids: List of player IDs in the squad
@@ -25,29 +68,47 @@ class CaptainSelector:
         Returns:
             Dictionary with captain recommendations
         """
+        return self._suggest_captain_cached(
+            frozenset(squad_player_ids),
+            num_gameweeks,
+            self.analyzer.current_gw,
+            self.analyzer.data_version
+        )
+    
+    def _suggest_captain(
+        self, 
+        squad_key: frozenset, 
+        num_gameweeks: int, 
+        current_gw: int, 
+        data_version: int
+    ) -> Dict:
+        """Uncached captain suggestion; the gameweek and data version only key the cache"""
         # Get squad data
-        squad_df = self.analyzer.players_df[
-            self.analyzer.players_df['id'].isin(squad_player_ids)
-        ].copy()
+        squad_df = self.analyzer.get_players_by_ids(squad_key)
         
         # Calculate expected points for each player
-        squad_df['expected_points'] = squad_df['id'].apply(
-            lambda x: self.analyzer.calculate_expected_points(x, num_gameweeks)
+        expected_points = self.analyzer.calculate_expected_points_batch(
+            squad_df['id'].to_numpy(), num_gameweeks
         )
         
-        # Calculate ceiling (high upside potential) based on position and form
-        squad_df['ceiling'] = squad_df.apply(self._calculate_ceiling, axis=1)
-        
-        # Calculate floor (consistent points) based on minutes and form
-        squad_df['floor'] = squad_df.apply(self._calculate_floor, axis=1)
+        # Calculate ceiling (high upside potential) based on position and form,
+        # and floor (consistent points) based on minutes and clean sheets
+        ceiling, floor = self._calculate_ceiling_and_floor(squad_df, expected_points)
         
         # Get fixture difficulty for next gameweek
-        squad_df['fixture_difficulty'] = squad_df['team'].apply(
-            lambda x: self.analyzer._get_fixture_difficulty(x, num_gameweeks)
+        fixture_difficulty = self.analyzer._get_fixture_difficulty_batch(
+            squad_df['team'].to_numpy(), num_gameweeks
+        )
+        
+        squad_df = squad_df.assign(
+            expected_points=expected_points,
+            ceiling=ceiling,
+            floor=floor,
+            fixture_difficulty=fixture_difficulty
         )
         
         # Sort by expected points
-        top_captains = squad_df.nlargest(5, 'expected_points')
+        top_captains = squad_df.iloc[top_k_indices(expected_points, 5)]
         
         # Get top 2 as captain and vice-captain
         captain = top_captains.iloc[0]
@@ -56,6 +117,10 @@ class CaptainSelector:
         # Alternative differential pick (lower ownership, high ceiling)
         differential = self._find_differential_captain(squad_df, captain['id'])
         
+        top_options = top_captains[
+            ['web_name', 'team_name', 'expected_points', 'selected_by_percent']
+        ].to_dict('list')
+        
         return {
             'captain': {
                 'id': captain['id'],
@@ -65,8 +130,13 @@ class CaptainSelector:
                 'expected_points': captain['expected_points'],
                 'fixture_difficulty': captain['fixture_difficulty'],
                 'ceiling': captain['ceiling'],
-                'ownership': float(captain['selected_by_percent']),
-                'reasoning': self._get_captain_reasoning(captain)
+                'ownership': captain['selected_by_percent'],
+                'reasoning': self._get_captain_reasoning(
+                    captain['expected_points'].item(),
+                    captain['form'].item(),
+                    captain['fixture_difficulty'].item(),
+                    captain['element_type'].item()
+                )
             },
             'vice_captain': {
                 'id': vice_captain['id'],
@@ -79,58 +149,40 @@ class CaptainSelector:
             'differential_option': differential,
             'top_5_options': [
                 {
-                    'name': row['web_name'],
-                    'team': row['team_name'],
-                    'expected_points': row['expected_points'],
-                    'ownership': float(row['selected_by_percent'])
+                    'name': name,
+                    'team': team,
+                    'expected_points': expected_points,
+                    'ownership': ownership
                 }
-                for _, row in top_captains.iterrows()
+                for name, team, expected_points, ownership in zip(
+                    top_options['web_name'],
+                    top_options['team_name'],
+                    top_options['expected_points'],
+                    top_options['selected_by_percent']
+                )
             ]
         }
     
-    def _calculate_ceiling(self, player: pd.Series) -> float:
-        """
-        Calculate the high upside potential for a player.
-        Attackers and players in form have higher ceilings.
-        """
-        base = float(player['expected_points'])
-        
-        # Position multiplier (attackers have higher ceiling)
-        position_mult = {1: 1.2, 2: 1.3, 3: 1.5, 4: 1.6}
-        mult = position_mult.get(player['element_type'], 1.0)
-        
-        # Form bonus
-        form = float(player['form']) if player['form'] else 0
-        form_bonus = form * 0.2
-        
-        # Recent high scores (check creativity/threat/ICT)
-        threat = float(player.get('threat', 0))
-        threat_bonus = (threat / 100) * 2  # Normalize threat score
-        
-        return base * mult + form_bonus + threat_bonus
-    
-    def _calculate_floor(self, player: pd.Series) -> float:
-        """
-        Calculate the consistent baseline points.
-        Players with high minutes and defensive stats have higher floors.
-        """
-        base = float(player['expected_points']) * 0.6  # Conservative estimate
-        
-        # Minutes played consistency
-        if player['minutes'] > 0 and player['starts'] > 0:
-            minutes_ratio = player['minutes'] / (player['starts'] * 90)
-            minutes_bonus = minutes_ratio * 2
-        else:
-            minutes_bonus = 0
-        
-        # Add bonus for clean sheet potential (defenders/GK)
-        if player['element_type'] in [1, 2]:
-            clean_sheet_prob = float(player.get('clean_sheets', 0)) / max(player['starts'], 1)
-            cs_bonus = clean_sheet_prob * 4
-        else:
-            cs_bonus = 0
-        
-        return base + minutes_bonus + cs_bonus
+    @staticmethod
+    def _calculate_ceiling_and_floor(
+        players: pd.DataFrame, 
+        expected_points: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Calculate ceiling and floor for each player from the frame's columns"""
+        def column(name: str) -> np.ndarray:
+            if name not in players:
+                return np.zeros(len(players))
+            return players[name].to_numpy(dtype=float)
+        
+        return score_players(
+            players['element_type'].to_numpy(),
+            column('form'),
+            column('threat'),
+            expected_points,
+            column('minutes'),
+            column('starts'),
+            column('clean_sheets')
+        )
     
     def _find_differential_captain(self, squad_df: pd.DataFrame, captain_id: int) -> Dict:
         """Find a differential captain pick (low ownership, high potential)"""
@@ -138,19 +190,20 @@ class CaptainSelector:
         differentials = squad_df[
             (squad_df['id'] != captain_id) &
             (squad_df['expected_points'] > 4)  # Minimum threshold
-        ].copy()
+        ]
         
         if len(differentials) == 0:
             return None
         
         # Calculate differential score: ceiling / ownership
-        differentials['ownership'] = differentials['selected_by_percent'].astype(float)
-        differentials['diff_score'] = (
-            differentials['ceiling'] * 100 / (differentials['ownership'] + 1)
+        ownership = differentials['selected_by_percent']
+        differentials = differentials.assign(
+            ownership=ownership,
+            diff_score=differentials['ceiling'] * 100 / (ownership + 1)
         )
         
         # Get best differential
-        best_diff = differentials.nlargest(1, 'diff_score').iloc[0]
+        best_diff = differentials.iloc[np.argmax(differentials['diff_score'].to_numpy())]
         
         return {
             'id': best_diff['id'],
@@ -162,31 +215,32 @@ class CaptainSelector:
             'reasoning': f"Differential pick with {best_diff['ownership']:.1f}% ownership and high ceiling"
         }
     
-    def _get_captain_reasoning(self, captain: pd.Series) -> str:
+    @staticmethod
+    def _get_captain_reasoning(
+        expected_points: float, 
+        form: float, 
+        difficulty: float, 
+        element_type: int
+    ) -> str:
         """Generate reasoning for captain choice"""
-        reasons = []
-        
-        # Expected points
-        reasons.append(f"Highest expected points ({captain['expected_points']:.1f})")
+        reasons = [f"Highest expected points ({expected_points:.1f})"]
         
         # Form
-        form = float(captain['form']) if captain['form'] else 0
         if form > 6:
             reasons.append(f"excellent form ({form:.1f})")
         elif form > 4:
             reasons.append(f"good form ({form:.1f})")
         
         # Fixture
-        difficulty = captain['fixture_difficulty']
         if difficulty < 2.5:
             reasons.append("favorable fixture")
         elif difficulty > 3.5:
             reasons.append("difficult fixture - be cautious")
         
         # Position
-        if captain['element_type'] == 4:
+        if element_type == 4:
             reasons.append("premium forward with high ceiling")
-        elif captain['element_type'] == 3:
+        elif element_type == 3:
             reasons.append("attacking midfielder")
         
         return ", ".join(reasons).capitalize()
@@ -202,39 +256,26 @@ class CaptainSelector:
         Returns:
             Dictionary with Triple Captain recommendation
         """
-        # Get current gameweek
-        current_gw = self.api.get_current_gameweek()
+        # Gameweek the analyzer's data was loaded for
+        current_gw = self.analyzer.current_gw
         
         # Check for double gameweeks
-        fixtures = self.api.get_fixtures()
-        fixtures_df = pd.DataFrame(fixtures)
-        
-        # Count fixtures per team in current gameweek
-        gw_fixtures = fixtures_df[fixtures_df['event'] == current_gw]
-        
-        teams_with_dgw = []
-        for team_id in self.analyzer.teams_df['id']:
-            team_fixtures = gw_fixtures[
-                (gw_fixtures['team_h'] == team_id) | (gw_fixtures['team_a'] == team_id)
-            ]
-            if len(team_fixtures) >= 2:
-                teams_with_dgw.append(team_id)
+        dgw_mask = self.analyzer.get_dgw_team_mask(current_gw)
         
         # Check if any squad players have double gameweek
-        squad_df = self.analyzer.players_df[
-            self.analyzer.players_df['id'].isin(squad_player_ids)
-        ]
+        squad_df = self.analyzer.get_players_by_ids(squad_player_ids)
         
-        dgw_players = squad_df[squad_df['team'].isin(teams_with_dgw)]
+        dgw_players = squad_df[dgw_mask[squad_df['team'].to_numpy()]]
         
         if len(dgw_players) > 0:
             # Calculate expected points for DGW
-            dgw_players = dgw_players.copy()
-            dgw_players['expected_points'] = dgw_players['id'].apply(
-                lambda x: self.analyzer.calculate_expected_points(x, 1) * 1.8  # ~2 games
+            dgw_players = dgw_players.assign(
+                expected_points=self.analyzer.calculate_expected_points_batch(
+                    dgw_players['id'].to_numpy(), 1
+                ) * 1.8  # ~2 games
             )
             
-            best_dgw = dgw_players.nlargest(1, 'expected_points').iloc[0]
+            best_dgw = dgw_players.iloc[np.argmax(dgw_players['expected_points'].to_numpy())]
             
             return {
                 'recommended': True,
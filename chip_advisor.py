@@ -1,17 +1,42 @@
 """
 Chip Advisor - Recommends when to use FPL chips (Wildcard, Free Hit, Bench Boost, Triple Captain)
 """
+import logging
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from fpl_api import FPLApi
 from player_analyzer import PlayerAnalyzer
 from transfer_suggester import TransferSuggester
 from captain_selector import CaptainSelector
 
+logger = logging.getLogger(__name__)
+
+
+class ChipEvaluationError(Exception):
+    """Raised with the otherwise complete recommendations when a chip evaluation fails"""
+    
+    def __init__(self, recommendations: Dict):
+        super().__init__('Chip evaluation failed')
+        self.recommendations = recommendations
+
 
 class ChipAdvisor:
     """Advises on optimal chip usage strategy"""
     
+    # FPL chip identifiers, in the order their evaluations are reported
+    CHIP_NAMES = ('wildcard', '3xc', 'bboost', 'freehit')
+    
+    # Response key holding each chip's evaluation
+    CHIP_KEYS = {
+        'wildcard': 'wildcard',
+        '3xc': 'triple_captain',
+        'bboost': 'bench_boost',
+        'freehit': 'free_hit'
+    }
+    
     def __init__(
         self, 
         api: FPLApi, 
@@ -23,10 +48,18 @@ class ChipAdvisor:
         self.analyzer = analyzer
         self.transfer_suggester = transfer_suggester
         self.captain_selector = captain_selector
+        # Chip evaluations are independent of each other and run side by side
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self._get_chip_recommendations_cached = lru_cache(maxsize=256)(
+            self._get_chip_recommendations
+        )
         
     def get_chip_recommendations(self, team_id: int) -> Dict:
         """
         Get comprehensive chip usage recommendations.
+        The team's chip history and picks are fetched on every call; successful
+        results are memoized per squad, chips used and data load. A chip whose
+        evaluation fails is reported with an error and the result is not memoized.
         
         Args:
             team_id: FPL team ID
@@ -35,103 +68,116 @@ class ChipAdvisor:
             Dictionary with all chip recommendations
         """
         try:
-            # Get team data
-            team_data = self.api.get_team(team_id)
-            team_history = self.api.get_team_history(team_id)
+            current_gw = self.analyzer.current_gw
             
-            # Check which chips have been used
-            chips_used = {chip['name'] for chip in team_history.get('chips', [])}
-            
-            current_gw = self.api.get_current_gameweek()
+            # Fetch chip history and current picks concurrently
+            history_future = self.api.executor.submit(self.api.get_team_history, team_id)
             picks_data = self.api.get_team_picks(team_id, current_gw)
+            chips_used = frozenset(chip['name'] for chip in history_future.result().get('chips', []))
             current_squad = [pick['element'] for pick in picks_data['picks']]
             
-            recommendations = {
-                'current_gameweek': current_gw,
-                'chips_used': list(chips_used),
-                'chips_available': []
-            }
-            
-            # Wildcard
-            if 'wildcard' not in chips_used and '3xc' not in chips_used:  # wildcard chip name varies
-                wildcard_rec = self.transfer_suggester.evaluate_wildcard(team_id, horizon=10)
-                if 'error' not in wildcard_rec:
-                    recommendations['wildcard'] = wildcard_rec
-                    if wildcard_rec['recommended']:
-                        recommendations['chips_available'].append('wildcard')
-            
-            # Triple Captain
-            if '3xc' not in chips_used:
-                tc_rec = self.captain_selector.evaluate_triple_captain(current_squad)
-                recommendations['triple_captain'] = tc_rec
-                if tc_rec['recommended']:
-                    recommendations['chips_available'].append('3xc')
-            
-            # Bench Boost
-            if 'bboost' not in chips_used:
-                bb_rec = self._evaluate_bench_boost(current_squad)
-                recommendations['bench_boost'] = bb_rec
-                if bb_rec['recommended']:
-                    recommendations['chips_available'].append('bboost')
-            
-            # Free Hit
-            if 'freehit' not in chips_used:
-                fh_rec = self._evaluate_free_hit(team_id, current_gw)
-                recommendations['free_hit'] = fh_rec
-                if fh_rec['recommended']:
-                    recommendations['chips_available'].append('freehit')
-            
-            # Overall strategy recommendation
-            recommendations['strategy'] = self._get_overall_strategy(
-                recommendations, current_gw
+            return self._get_chip_recommendations_cached(
+                frozenset(current_squad),
+                chips_used,
+                current_gw,
+                self.analyzer.data_version
             )
-            
-            return recommendations
-            
+        except ChipEvaluationError as e:
+            return e.recommendations
         except Exception as e:
             return {
                 'error': f'Could not generate chip recommendations: {str(e)}'
             }
     
-    def _evaluate_bench_boost(self, squad_player_ids: List[int]) -> Dict:
+    def _get_chip_recommendations(
+        self, 
+        squad_key: frozenset, 
+        chips_used: frozenset, 
+        current_gw: int, 
+        data_version: int
+    ) -> Dict:
         """
-        Evaluate whether to use Bench Boost chip.
-        Best used on double gameweeks or when bench has high expected points.
+        Uncached chip recommendations; raises on failure so errors are never
+        memoized, with ChipEvaluationError if only some chips failed
         """
-        current_gw = self.api.get_current_gameweek()
+        current_squad = sorted(squad_key)
+        dgw_mask = self.analyzer.get_dgw_team_mask(current_gw)
         
-        # Check for double gameweeks
-        fixtures = self.api.get_fixtures()
-        fixtures_df = pd.DataFrame(fixtures)
-        gw_fixtures = fixtures_df[fixtures_df['event'] == current_gw]
+        # Squad expected points and fixture difficulty, shared by the chip evaluators
+        table = self.analyzer.player_table
+        squad_ids = table.known_ids(squad_key)
+        expected_points = self.analyzer.calculate_expected_points_batch(squad_ids, 1)
+        fixture_difficulty = self.analyzer._get_fixture_difficulty_batch(table.team[squad_ids], 1)
         
-        teams_with_dgw = []
-        for team_id in self.analyzer.teams_df['id']:
-            team_fixtures = gw_fixtures[
-                (gw_fixtures['team_h'] == team_id) | (gw_fixtures['team_a'] == team_id)
-            ]
-            if len(team_fixtures) >= 2:
-                teams_with_dgw.append(team_id)
+        recommendations = {
+            'current_gameweek': current_gw,
+            'chips_used': list(chips_used),
+            'chips_available': []
+        }
         
-        # Get squad data
-        squad_df = self.analyzer.players_df[
-            self.analyzer.players_df['id'].isin(squad_player_ids)
-        ].copy()
+        evaluators = {
+            'wildcard': lambda: self.transfer_suggester.evaluate_squad_wildcard(current_squad, horizon=10),
+            '3xc': lambda: self.captain_selector.evaluate_triple_captain(current_squad),
+            'bboost': lambda: self._evaluate_bench_boost(squad_ids, expected_points, dgw_mask),
+            'freehit': lambda: self._evaluate_free_hit(
+                squad_ids, expected_points, fixture_difficulty, dgw_mask
+            )
+        }
+        
+        # Dispatch the evaluations for every unused chip at once
+        futures = {
+            name: self.executor.submit(evaluators[name])
+            for name in self.CHIP_NAMES if name not in chips_used
+        }
+        
+        # A chip whose evaluation raises is reported with its error rather than
+        # failing the others
+        failed = False
+        for name, future in futures.items():
+            try:
+                chip_rec = future.result()
+            except Exception as e:
+                logger.exception('Evaluating the %s chip failed', name)
+                recommendations[self.CHIP_KEYS[name]] = {'error': str(e)}
+                failed = True
+                continue
+            if 'error' in chip_rec:
+                continue
+            recommendations[self.CHIP_KEYS[name]] = chip_rec
+            if chip_rec['recommended']:
+                recommendations['chips_available'].append(name)
         
-        # Calculate expected points
-        squad_df['expected_points'] = squad_df['id'].apply(
-            lambda x: self.analyzer.calculate_expected_points(x, 1)
+        # Overall strategy recommendation
+        recommendations['strategy'] = self._get_overall_strategy(
+            recommendations, current_gw
         )
         
-        # Sort by expected points to simulate lineup
-        squad_df = squad_df.sort_values('expected_points', ascending=False)
+        if failed:
+            raise ChipEvaluationError(recommendations)
+        return recommendations
+    
+    def _evaluate_bench_boost(
+        self, 
+        squad_ids: np.ndarray, 
+        expected_points: np.ndarray, 
+        dgw_mask: np.ndarray
+    ) -> Dict:
+        """
+        Evaluate whether to use Bench Boost chip.
+        Best used on double gameweeks or when bench has high expected points.
+        """
+        table = self.analyzer.player_table
+        is_double_gameweek = bool(dgw_mask.any())
         
-        # Assume top 11 are starters, bottom 4 are bench
-        bench = squad_df.tail(4)
-        bench_expected = bench['expected_points'].sum()
+        # Sort by expected points to simulate lineup; assume top 11 start, bottom 4 are bench
+        bench = np.argsort(-expected_points, kind='stable')[-4:]
+        bench_ids = squad_ids[bench]
+        bench_points = expected_points[bench]
+        bench_expected = float(bench_points.sum())
         
         # Check if bench players have DGW
-        bench_dgw_count = (bench['team'].isin(teams_with_dgw)).sum()
+        bench_has_dgw = dgw_mask[table.team[bench_ids]]
+        bench_dgw_count = int(bench_has_dgw.sum())
         
         # Recommend if:
         # 1. It's a double gameweek with multiple bench players having DGW
@@ -143,7 +189,7 @@ class ChipAdvisor:
         elif bench_expected > 15:
             recommended = True
             reason = f"Strong bench with {bench_expected:.1f} expected points"
-        elif len(teams_with_dgw) > 0 and bench_expected > 10:
+        elif is_double_gameweek and bench_expected > 10:
             recommended = True
             reason = f"Double gameweek opportunity with decent bench"
         else:
@@ -154,74 +200,48 @@ class ChipAdvisor:
             'recommended': recommended,
             'reason': reason,
             'bench_expected_points': bench_expected,
-            'double_gameweek': len(teams_with_dgw) > 0,
+            'double_gameweek': is_double_gameweek,
             'bench_players': [
-                {
-                    'name': row['web_name'],
-                    'team': row['team_name'],
-                    'expected_points': row['expected_points'],
-                    'has_dgw': row['team'] in teams_with_dgw
-                }
-                for _, row in bench.iterrows()
+                {'name': name, 'team': team, 'expected_points': points, 'has_dgw': has_dgw}
+                for name, team, points, has_dgw in zip(
+                    table.web_name[bench_ids].tolist(),
+                    table.team_name[bench_ids].tolist(),
+                    bench_points.tolist(),
+                    bench_has_dgw.tolist()
+                )
             ]
         }
     
-    def _evaluate_free_hit(self, team_id: int, current_gw: int) -> Dict:
+    def _evaluate_free_hit(
+        self, 
+        squad_ids: np.ndarray, 
+        expected_points: np.ndarray, 
+        fixture_difficulty: np.ndarray, 
+        dgw_mask: np.ndarray
+    ) -> Dict:
         """
         Evaluate whether to use Free Hit chip.
         Best used when many players blank or have difficult fixtures.
         """
         try:
-            # Get current squad
-            picks_data = self.api.get_team_picks(team_id, current_gw)
-            current_squad = [pick['element'] for pick in picks_data['picks']]
-            
-            # Get squad data
-            squad_df = self.analyzer.players_df[
-                self.analyzer.players_df['id'].isin(current_squad)
-            ].copy()
-            
-            # Calculate expected points for current squad
-            squad_df['expected_points'] = squad_df['id'].apply(
-                lambda x: self.analyzer.calculate_expected_points(x, 1)
-            )
-            
-            current_expected = squad_df['expected_points'].sum()
-            
-            # Check fixture difficulty
-            squad_df['fixture_difficulty'] = squad_df['team'].apply(
-                lambda x: self.analyzer._get_fixture_difficulty(x, 1)
-            )
+            current_expected = float(expected_points.sum())
             
             # Count players with difficult fixtures (4+)
-            difficult_fixtures = (squad_df['fixture_difficulty'] >= 4).sum()
+            difficult_fixtures = int((fixture_difficulty >= 4).sum())
             
             # Count blanking players (expected < 2 points)
-            blanking_players = (squad_df['expected_points'] < 2).sum()
-            
-            # Check for double gameweeks
-            fixtures = self.api.get_fixtures()
-            fixtures_df = pd.DataFrame(fixtures)
-            gw_fixtures = fixtures_df[fixtures_df['event'] == current_gw]
-            
-            teams_with_dgw = []
-            for team_id_check in self.analyzer.teams_df['id']:
-                team_fixtures = gw_fixtures[
-                    (gw_fixtures['team_h'] == team_id_check) | 
-                    (gw_fixtures['team_a'] == team_id_check)
-                ]
-                if len(team_fixtures) >= 2:
-                    teams_with_dgw.append(team_id_check)
+            blanking_players = int((expected_points < 2).sum())
             
             # Count current squad players in DGW
-            dgw_in_squad = (squad_df['team'].isin(teams_with_dgw)).sum()
+            dgw_in_squad = int(dgw_mask[self.analyzer.player_table.team[squad_ids]].sum())
+            dgw_teams = int(dgw_mask.sum())
             
             # Recommend Free Hit if:
             # 1. Many difficult fixtures and few DGW players
             # 2. Many blanking players
             # 3. There's a big DGW but you don't have many players
             
-            if len(teams_with_dgw) >= 5 and dgw_in_squad < 5:
+            if dgw_teams >= 5 and dgw_in_squad < 5:
                 recommended = True
                 reason = f"Big double gameweek but only {dgw_in_squad} of your players have DGW"
             elif difficult_fixtures >= 8:
@@ -243,7 +263,7 @@ class ChipAdvisor:
                 'current_expected_points': current_expected,
                 'difficult_fixtures_count': difficult_fixtures,
                 'blanking_players_count': blanking_players,
-                'dgw_teams': len(teams_with_dgw),
+                'dgw_teams': dgw_teams,
                 'dgw_in_squad': dgw_in_squad
             }
             
@@ -264,34 +284,19 @@ class ChipAdvisor:
             }
         
         # Priority order: Free Hit (for DGW) > Triple Captain (for DGW) > Bench Boost (for DGW) > Wildcard
-        priorities = []
-        
-        if 'freehit' in chips_available:
-            fh_rec = recommendations.get('free_hit', {})
-            if fh_rec.get('dgw_teams', 0) >= 5:
-                priorities.append(('freehit', 'high', fh_rec.get('reason', '')))
-        
-        if '3xc' in chips_available:
-            tc_rec = recommendations.get('triple_captain', {})
-            if tc_rec.get('reason') == 'Double Gameweek':
-                priorities.append(('3xc', 'high', tc_rec.get('reasoning', '')))
-            elif tc_rec.get('recommended'):
-                priorities.append(('3xc', 'medium', tc_rec.get('reasoning', '')))
-        
-        if 'bboost' in chips_available:
-            bb_rec = recommendations.get('bench_boost', {})
-            if bb_rec.get('double_gameweek') and bb_rec.get('bench_expected_points', 0) > 12:
-                priorities.append(('bboost', 'high', bb_rec.get('reason', '')))
-            elif bb_rec.get('recommended'):
-                priorities.append(('bboost', 'medium', bb_rec.get('reason', '')))
+        rules = (
+            ('freehit', self._free_hit_priority),
+            ('3xc', self._triple_captain_priority),
+            ('bboost', self._bench_boost_priority),
+            ('wildcard', self._wildcard_priority)
+        )
         
-        if 'wildcard' in chips_available:
-            wc_rec = recommendations.get('wildcard', {})
-            if wc_rec.get('recommended'):
-                if current_gw <= 10:
-                    priorities.append(('wildcard', 'high', 'Early season team overhaul'))
-                else:
-                    priorities.append(('wildcard', 'medium', wc_rec.get('reasoning', '')))
+        priorities = []
+        for chip, rule in rules:
+            if chip in chips_available:
+                priority = rule(recommendations.get(self.CHIP_KEYS[chip], {}), current_gw)
+                if priority:
+                    priorities.append((chip, *priority))
         
         if not priorities:
             return {
@@ -315,4 +320,37 @@ class ChipAdvisor:
                 for p in priorities
             ]
         }
-
+    
+    @staticmethod
+    def _free_hit_priority(fh_rec: Dict, current_gw: int) -> Optional[Tuple[str, str]]:
+        """Free Hit is a priority only around a big double gameweek"""
+        if fh_rec.get('dgw_teams', 0) >= 5:
+            return 'high', fh_rec.get('reason', '')
+        return None
+    
+    @staticmethod
+    def _triple_captain_priority(tc_rec: Dict, current_gw: int) -> Optional[Tuple[str, str]]:
+        """Triple Captain is a priority on a double gameweek, otherwise when recommended"""
+        if tc_rec.get('reason') == 'Double Gameweek':
+            return 'high', tc_rec.get('reasoning', '')
+        if tc_rec.get('recommended'):
+            return 'medium', tc_rec.get('reasoning', '')
+        return None
+    
+    @staticmethod
+    def _bench_boost_priority(bb_rec: Dict, current_gw: int) -> Optional[Tuple[str, str]]:
+        """Bench Boost is a priority on a double gameweek with a strong bench"""
+        if bb_rec.get('double_gameweek') and bb_rec.get('bench_expected_points', 0) > 12:
+            return 'high', bb_rec.get('reason', '')
+        if bb_rec.get('recommended'):
+            return 'medium', bb_rec.get('reason', '')
+        return None
+    
+    @staticmethod
+    def _wildcard_priority(wc_rec: Dict, current_gw: int) -> Optional[Tuple[str, str]]:
+        """An early-season wildcard is high priority, later ones medium"""
+        if not wc_rec.get('recommended'):
+            return None
+        if current_gw <= 10:
+            return 'high', 'Early season team overhaul'
+        return 'medium', wc_rec.get('reasoning', '')
@@ -1,9 +1,19 @@
 """
 FPL API Client - Fetches data from the official Fantasy Premier League API
 """
+import hashlib
+import orjson
+import os
+import pandas as pd
 import requests
+import sqlite3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
 import time
-from typing import Dict, List, Optional
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 
 
@@ -12,21 +22,192 @@ class FPLApi:
     
     BASE_URL = "https://fantasy.premierleague.com/api"
     
-    def __init__(self):
-        self.session = requests.Session()
+    # Seconds before memoized bootstrap/fixtures data is refetched
+    CACHE_TTL = 300
+    
+    # Compact dtypes for the fixture table; event is nullable for unscheduled fixtures
+    FIXTURE_DTYPES = {
+        'event': 'Int16',
+        'team_h': 'int8',
+        'team_a': 'int8',
+        'team_h_difficulty': 'int8',
+        'team_a_difficulty': 'int8'
+    }
+    
+    # Upper bound on simultaneous requests to the FPL servers
+    MAX_CONCURRENT_REQUESTS = 4
+    
+    # Seconds to wait for the FPL servers before giving up on a request
+    REQUEST_TIMEOUT = 10
+    
+    # Transient gateway errors from the FPL servers are retried with backoff;
+    # once retries run out the last response surfaces through raise_for_status
+    RETRY_POLICY = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False
+    )
+    
+    REQUEST_HEADERS = {
+        'Accept-Encoding': 'gzip, deflate',
+        'User-Agent': 'fpl-optimizer/1.0'
+    }
+    
+    # On-disk response cache shared across processes and runs
+    DISK_CACHE_PATH = os.environ.get('FPL_CACHE_PATH', '.fpl_cache.sqlite')
+    DISK_CACHE_DEFAULT_TTL = 3600
+    # Seconds a cached response stays valid, by the first matching URL fragment
+    DISK_CACHE_TTLS = (
+        ('/bootstrap-static/', 3600),
+        ('/fixtures/', 21600),
+        ('/entry/', 300),
+    )
+    
+    def __init__(self, cache_ttl: float = CACHE_TTL, disk_cache_path: Optional[str] = DISK_CACHE_PATH):
+        self.session = self._create_session()
+        self.cache_ttl = cache_ttl
+        self.disk_cache_path = disk_cache_path
         self._bootstrap_data = None
+        self._bootstrap_fetched_at = 0.0
         self._fixtures = None
+        self._fixtures_fetched_at = 0.0
+        self._fixtures_df = None
+        self._fixtures_df_source = None
+        self._player_detail_cache: Dict[int, Dict] = {}
+        # (bootstrap payload, gameweek) pair; recomputed whenever the payload is refetched
+        self._current_gw_memo = (None, None)
+        # Shared pool for overlapping independent requests
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS)
+        self._request_slots = threading.BoundedSemaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        if self.disk_cache_path:
+            self._init_disk_cache()
+        
+    def _create_session(self) -> requests.Session:
+        """
+        Create a session whose keep-alive pool holds a connection for every
+        concurrent request and which retries transient gateway errors.
+        """
+        session = requests.Session()
+        session.headers.update(self.REQUEST_HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.MAX_CONCURRENT_REQUESTS,
+            max_retries=self.RETRY_POLICY
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _get(self, url: str, force_refresh: bool = False):
+        """
+        GET a URL and decode the JSON body, limiting concurrent requests.
+        Responses are served from the on-disk cache while they are fresh.
+        """
+        if not force_refresh:
+            body = self._disk_cache_read(url)
+            if body is not None:
+                return orjson.loads(body)
+        
+        with self._request_slots:
+            response = self.session.get(url, timeout=self.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        self._disk_cache_write(url, response.content)
+        return orjson.loads(response.content)
+    
+    @staticmethod
+    def _cache_key(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+    
+    def _disk_cache_ttl(self, url: str) -> float:
+        """Time-to-live for a cached response from the given URL"""
+        for fragment, ttl in self.DISK_CACHE_TTLS:
+            if fragment in url:
+                return ttl
+        return self.DISK_CACHE_DEFAULT_TTL
+    
+    def _disk_cache_connect(self) -> sqlite3.Connection:
+        # A short-lived connection per operation is safe across threads and forked workers
+        return sqlite3.connect(self.disk_cache_path, timeout=5)
+    
+    def _init_disk_cache(self):
+        """Create the response table, disabling the disk cache if the file is unusable"""
+        try:
+            with closing(self._disk_cache_connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, body BLOB NOT NULL)"
+                )
+        except sqlite3.Error:
+            self.disk_cache_path = None
+    
+    def _disk_cache_read(self, url: str) -> Optional[bytes]:
+        """Return the cached body for a URL if it is still fresh"""
+        if not self.disk_cache_path:
+            return None
+        try:
+            with closing(self._disk_cache_connect()) as conn:
+                row = conn.execute(
+                    "SELECT fetched_at, body FROM responses WHERE key = ?",
+                    (self._cache_key(url),)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or time.time() - row[0] > self._disk_cache_ttl(url):
+            return None
+        return row[1]
+    
+    def _disk_cache_write(self, url: str, body: bytes):
+        """Store a response body; cache failures never fail the request"""
+        if not self.disk_cache_path:
+            return
+        try:
+            with closing(self._disk_cache_connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, fetched_at, body) VALUES (?, ?, ?)",
+                    (self._cache_key(url), time.time(), body)
+                )
+        except sqlite3.Error:
+            pass
+    
+    def _disk_cache_delete(self, *urls: str):
+        """Evict cached responses so the next request goes to the network"""
+        if not self.disk_cache_path:
+            return
+        try:
+            with closing(self._disk_cache_connect()) as conn, conn:
+                conn.executemany(
+                    "DELETE FROM responses WHERE key = ?",
+                    [(self._cache_key(url),) for url in urls]
+                )
+        except sqlite3.Error:
+            pass
+        
+    def _is_stale(self, fetched_at: float) -> bool:
+        """Check whether memoized data fetched at the given time has outlived the TTL"""
+        return time.monotonic() - fetched_at > self.cache_ttl
+    
+    def invalidate(self):
+        """Drop memoized and disk-cached bootstrap and fixtures data so the next access refetches it"""
+        self._bootstrap_data = None
+        self._fixtures = None
+        self._player_detail_cache = {}
+        self._disk_cache_delete(
+            f"{self.BASE_URL}/bootstrap-static/",
+            f"{self.BASE_URL}/fixtures/"
+        )
         
     def get_bootstrap_data(self, force_refresh: bool = False) -> Dict:
         """
         Get bootstrap-static data containing all players, teams, and gameweek info.
-        This is cached to avoid excessive API calls.
+        This is cached for cache_ttl seconds to avoid excessive API calls.
         """
-        if self._bootstrap_data is None or force_refresh:
+        if (self._bootstrap_data is None or force_refresh or 
+                self._is_stale(self._bootstrap_fetched_at)):
             url = f"{self.BASE_URL}/bootstrap-static/"
-            response = self.session.get(url)
-            response.raise_for_status()
-            self._bootstrap_data = response.json()
+            self._bootstrap_data = self._get(url, force_refresh)
+            self._bootstrap_fetched_at = time.monotonic()
         return self._bootstrap_data
     
     def get_players(self) -> List[Dict]:
@@ -45,13 +226,22 @@ class FPLApi:
         return data['element_types']
     
     def get_current_gameweek(self) -> int:
-        """Get the current gameweek number"""
+        """Get the current gameweek number (memoized per bootstrap fetch)"""
         data = self.get_bootstrap_data()
-        for event in data['events']:
+        source, gameweek = self._current_gw_memo
+        if source is not data:
+            gameweek = self._find_current_gameweek(data['events'])
+            self._current_gw_memo = (data, gameweek)
+        return gameweek
+    
+    @staticmethod
+    def _find_current_gameweek(events: List[Dict]) -> int:
+        """Pick the current gameweek from the bootstrap events"""
+        for event in events:
             if event['is_current']:
                 return event['id']
         # If no current gameweek, return next one
-        for event in data['events']:
+        for event in events:
             if event['is_next']:
                 return event['id']
         return 1
@@ -62,48 +252,79 @@ class FPLApi:
         return data['events']
     
     def get_fixtures(self, force_refresh: bool = False) -> List[Dict]:
-        """Get all fixture data"""
-        if self._fixtures is None or force_refresh:
+        """Get all fixture data (cached for cache_ttl seconds)"""
+        if self._fixtures is None or force_refresh or self._is_stale(self._fixtures_fetched_at):
             url = f"{self.BASE_URL}/fixtures/"
-            response = self.session.get(url)
-            response.raise_for_status()
-            self._fixtures = response.json()
+            self._fixtures = self._get(url, force_refresh)
+            self._fixtures_fetched_at = time.monotonic()
         return self._fixtures
     
+    def get_fixtures_df(self, force_refresh: bool = False) -> pd.DataFrame:
+        """
+        Get all fixtures as a DataFrame with compact dtypes.
+        The frame is rebuilt only when the underlying fixture list is refetched.
+        """
+        fixtures = self.get_fixtures(force_refresh)
+        fixtures_df = self._fixtures_df
+        if fixtures_df is None or self._fixtures_df_source is not fixtures:
+            fixtures_df = pd.DataFrame(fixtures)
+            fixtures_df = fixtures_df.astype(
+                {col: dtype for col, dtype in self.FIXTURE_DTYPES.items() if col in fixtures_df}
+            )
+            self._fixtures_df, self._fixtures_df_source = fixtures_df, fixtures
+        return fixtures_df
+    
     def get_player_details(self, player_id: int) -> Dict:
         """Get detailed information for a specific player"""
         url = f"{self.BASE_URL}/element-summary/{player_id}/"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url)
+    
+    def get_players_details_bulk(self, player_ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Get detailed information for many players, fetching them concurrently.
+        Results are kept until the next invalidate(), so repeated ids are not refetched.
+        
+        Returns:
+            Dictionary mapping player ID to its element-summary data
+        """
+        player_ids = list(dict.fromkeys(player_ids))
+        cache = self._player_detail_cache
+        missing = [player_id for player_id in player_ids if player_id not in cache]
+        
+        # The shared pool and request semaphore bound how many fetches are in flight
+        for player_id, details in zip(missing, self.executor.map(self.get_player_details, missing)):
+            cache[player_id] = details
+        
+        return {player_id: cache[player_id] for player_id in player_ids}
     
     def get_team(self, team_id: int) -> Dict:
         """Get a user's FPL team"""
         url = f"{self.BASE_URL}/entry/{team_id}/"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url)
     
     def get_team_picks(self, team_id: int, gameweek: Optional[int] = None) -> Dict:
         """Get a user's team picks for a specific gameweek"""
         if gameweek is None:
             gameweek = self.get_current_gameweek()
         url = f"{self.BASE_URL}/entry/{team_id}/event/{gameweek}/picks/"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url)
+    
+    def prefetch_squad(self, team_id: int) -> Tuple[int, Dict]:
+        """
+        Get the current gameweek and a user's picks for it.
+        The gameweek is read from memoized bootstrap data, so normally only the
+        picks request touches the network.
+        """
+        gameweek = self.get_current_gameweek()
+        return gameweek, self.get_team_picks(team_id, gameweek)
     
     def get_team_transfers(self, team_id: int) -> Dict:
         """Get a user's transfer history"""
         url = f"{self.BASE_URL}/entry/{team_id}/transfers/"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url)
     
     def get_team_history(self, team_id: int) -> Dict:
         """Get a user's team history"""
         url = f"{self.BASE_URL}/entry/{team_id}/history/"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self._get(url)
 
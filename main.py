@@ -4,34 +4,39 @@ Fantasy Premier League Team Optimizer - Main CLI
 """
 import argparse
 import sys
-from typing import Optional
+from typing import List, Optional
 from fpl_api import FPLApi
 from player_analyzer import PlayerAnalyzer
-from team_optimizer import TeamOptimizer
-from transfer_suggester import TransferSuggester
-from captain_selector import CaptainSelector
-from chip_advisor import ChipAdvisor
+
+
+def section_lines(title: str) -> List[str]:
+    """Lines of a formatted section header"""
+    return ["\n" + "=" * 70, f"  {title}", "=" * 70 + "\n"]
+
+
+def write_lines(lines: List[str]):
+    """Write a block of output with a single call instead of one print per line"""
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def print_section(title: str):
     """Print a formatted section header"""
-    print("\n" + "=" * 70)
-    print(f"  {title}")
-    print("=" * 70 + "\n")
+    write_lines(section_lines(title))
 
 
 def print_optimal_squad(result: dict):
     """Print optimal squad selection"""
-    print_section("OPTIMAL SQUAD")
+    lines = section_lines("OPTIMAL SQUAD")
     
     if 'error' in result:
-        print(f"Error: {result['error']}")
+        lines.append(f"Error: {result['error']}")
+        write_lines(lines)
         return
     
-    print(f"Total Cost: £{result['total_cost']:.1f}m")
-    print(f"Remaining Budget: £{result['remaining_budget']:.1f}m")
-    print(f"Total Expected Points: {result['total_expected_points']:.1f}")
-    print(f"\nStatus: {result['status']}\n")
+    lines.append(f"Total Cost: £{result['total_cost']:.1f}m")
+    lines.append(f"Remaining Budget: £{result['remaining_budget']:.1f}m")
+    lines.append(f"Total Expected Points: {result['total_expected_points']:.1f}")
+    lines.append(f"\nStatus: {result['status']}\n")
     
     # Group by position
     positions = {1: "Goalkeepers", 2: "Defenders", 3: "Midfielders", 4: "Forwards"}
@@ -39,188 +44,217 @@ def print_optimal_squad(result: dict):
     for pos_id in [1, 2, 3, 4]:
         players = [p for p in result['players'] if p['position'] == pos_id]
         if players:
-            print(f"\n{positions[pos_id]}:")
-            print("-" * 70)
+            lines.append(f"\n{positions[pos_id]}:")
+            lines.append("-" * 70)
             for p in players:
-                print(f"  {p['name']:20} ({p['team']:15}) £{p['cost']:.1f}m  "
-                      f"EP: {p['expected_points']:.1f}")
+                lines.append(f"  {p['name']:20} ({p['team']:15}) £{p['cost']:.1f}m  "
+                             f"EP: {p['expected_points']:.1f}")
+    
+    write_lines(lines)
 
 
 def print_starting_xi(result: dict):
     """Print starting XI and bench"""
-    print_section("STARTING XI")
+    lines = section_lines("STARTING XI")
     
-    print(f"Formation: {result['formation']}")
-    print(f"Total Expected Points: {result['total_expected_points']:.1f}\n")
+    lines.append(f"Formation: {result['formation']}")
+    lines.append(f"Total Expected Points: {result['total_expected_points']:.1f}\n")
     
     positions = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
     
-    print("Starting XI:")
-    print("-" * 70)
+    lines.append("Starting XI:")
+    lines.append("-" * 70)
     for p in result['starting_xi']:
-        print(f"  {positions[p['position']]:5} {p['name']:20} ({p['team']:15}) "
-              f"EP: {p['expected_points']:.1f}")
+        lines.append(f"  {positions[p['position']]:5} {p['name']:20} ({p['team']:15}) "
+                     f"EP: {p['expected_points']:.1f}")
     
-    print("\nBench:")
-    print("-" * 70)
+    lines.append("\nBench:")
+    lines.append("-" * 70)
     for i, p in enumerate(result['bench'], 1):
-        print(f"  {i}. {positions[p['position']]:5} {p['name']:20} ({p['team']:15}) "
-              f"EP: {p['expected_points']:.1f}")
+        lines.append(f"  {i}. {positions[p['position']]:5} {p['name']:20} ({p['team']:15}) "
+                     f"EP: {p['expected_points']:.1f}")
+    
+    write_lines(lines)
 
 
 def print_transfers(result: dict):
     """Print transfer suggestions"""
-    print_section("TRANSFER SUGGESTIONS")
+    lines = section_lines("TRANSFER SUGGESTIONS")
     
     if 'error' in result:
-        print(f"Error: {result['error']}")
+        lines.append(f"Error: {result['error']}")
+        write_lines(lines)
         return
     
-    print(f"Recommendation: {result['recommendation']}")
-    print(f"Expected Improvement: {result['expected_improvement']:.1f} points\n")
+    lines.append(f"Recommendation: {result['recommendation']}")
+    lines.append(f"Expected Improvement: {result['expected_improvement']:.1f} points\n")
     
     if not result['transfers']:
-        print("No beneficial transfers found at this time.")
+        lines.append("No beneficial transfers found at this time.")
+        write_lines(lines)
         return
     
     for i, transfer in enumerate(result['transfers'], 1):
-        print(f"\nTransfer {i}:")
-        print("-" * 70)
-        print(f"  OUT: {transfer['out']['name']:20} ({transfer['out']['team']:15}) "
-              f"£{transfer['out']['cost']:.1f}m  EP: {transfer['out']['expected_points']:.1f}")
-        print(f"  IN:  {transfer['in']['name']:20} ({transfer['in']['team']:15}) "
-              f"£{transfer['in']['cost']:.1f}m  EP: {transfer['in']['expected_points']:.1f}")
-        print(f"  Cost Change: {transfer['cost_change']:+.1f}m")
-        print(f"  Points Improvement: {transfer['points_improvement']:+.1f}")
+        lines.append(f"\nTransfer {i}:")
+        lines.append("-" * 70)
+        lines.append(f"  OUT: {transfer['out']['name']:20} ({transfer['out']['team']:15}) "
+                     f"£{transfer['out']['cost']:.1f}m  EP: {transfer['out']['expected_points']:.1f}")
+        lines.append(f"  IN:  {transfer['in']['name']:20} ({transfer['in']['team']:15}) "
+                     f"£{transfer['in']['cost']:.1f}m  EP: {transfer['in']['expected_points']:.1f}")
+        lines.append(f"  Cost Change: {transfer['cost_change']:+.1f}m")
+        lines.append(f"  Points Improvement: {transfer['points_improvement']:+.1f}")
+    
+    write_lines(lines)
 
 
 def print_captain(result: dict):
     """Print captain recommendations"""
-    print_section("CAPTAIN RECOMMENDATIONS")
+    lines = section_lines("CAPTAIN RECOMMENDATIONS")
     
     captain = result['captain']
     vice = result['vice_captain']
     
-    print("Captain:")
-    print("-" * 70)
-    print(f"  {captain['name']} ({captain['team']})")
-    print(f"  Expected Points: {captain['expected_points']:.1f}")
-    print(f"  Fixture Difficulty: {captain['fixture_difficulty']:.1f}/5")
-    print(f"  High Ceiling: {captain['ceiling']:.1f}")
-    print(f"  Ownership: {captain['ownership']:.1f}%")
-    print(f"  Reasoning: {captain['reasoning']}")
+    lines.append("Captain:")
+    lines.append("-" * 70)
+    lines.append(f"  {captain['name']} ({captain['team']})")
+    lines.append(f"  Expected Points: {captain['expected_points']:.1f}")
+    lines.append(f"  Fixture Difficulty: {captain['fixture_difficulty']:.1f}/5")
+    lines.append(f"  High Ceiling: {captain['ceiling']:.1f}")
+    lines.append(f"  Ownership: {captain['ownership']:.1f}%")
+    lines.append(f"  Reasoning: {captain['reasoning']}")
     
-    print("\nVice-Captain:")
-    print("-" * 70)
-    print(f"  {vice['name']} ({vice['team']})")
-    print(f"  Expected Points: {vice['expected_points']:.1f}")
+    lines.append("\nVice-Captain:")
+    lines.append("-" * 70)
+    lines.append(f"  {vice['name']} ({vice['team']})")
+    lines.append(f"  Expected Points: {vice['expected_points']:.1f}")
     
     if result.get('differential_option'):
         diff = result['differential_option']
-        print("\nDifferential Option (Risky):")
-        print("-" * 70)
-        print(f"  {diff['name']} ({diff['team']})")
-        print(f"  Expected Points: {diff['expected_points']:.1f}")
-        print(f"  Ceiling: {diff['ceiling']:.1f}")
-        print(f"  Ownership: {diff['ownership']:.1f}%")
-        print(f"  {diff['reasoning']}")
-    
-    print("\nTop 5 Captain Options:")
-    print("-" * 70)
+        lines.append("\nDifferential Option (Risky):")
+        lines.append("-" * 70)
+        lines.append(f"  {diff['name']} ({diff['team']})")
+        lines.append(f"  Expected Points: {diff['expected_points']:.1f}")
+        lines.append(f"  Ceiling: {diff['ceiling']:.1f}")
+        lines.append(f"  Ownership: {diff['ownership']:.1f}%")
+        lines.append(f"  {diff['reasoning']}")
+    
+    lines.append("\nTop 5 Captain Options:")
+    lines.append("-" * 70)
     for i, option in enumerate(result['top_5_options'], 1):
-        print(f"  {i}. {option['name']:20} ({option['team']:15}) "
-              f"EP: {option['expected_points']:.1f}  Own: {option['ownership']:.1f}%")
+        lines.append(f"  {i}. {option['name']:20} ({option['team']:15}) "
+                     f"EP: {option['expected_points']:.1f}  Own: {option['ownership']:.1f}%")
+    
+    write_lines(lines)
 
 
 def print_chips(result: dict):
     """Print chip recommendations"""
-    print_section("CHIP RECOMMENDATIONS")
+    lines = section_lines("CHIP RECOMMENDATIONS")
     
     if 'error' in result:
-        print(f"Error: {result['error']}")
+        lines.append(f"Error: {result['error']}")
+        write_lines(lines)
         return
     
-    print(f"Current Gameweek: {result['current_gameweek']}")
-    print(f"Chips Used: {', '.join(result['chips_used']) if result['chips_used'] else 'None'}\n")
+    lines.append(f"Current Gameweek: {result['current_gameweek']}")
+    lines.append(f"Chips Used: {', '.join(result['chips_used']) if result['chips_used'] else 'None'}\n")
     
     strategy = result.get('strategy', {})
     if strategy:
-        print("OVERALL STRATEGY:")
-        print("-" * 70)
-        print(f"Recommendation: {strategy['recommendation']}")
+        lines.append("OVERALL STRATEGY:")
+        lines.append("-" * 70)
+        lines.append(f"Recommendation: {strategy['recommendation']}")
         if strategy.get('priority'):
-            print(f"Priority: {strategy['priority'].upper()}")
-            print(f"Reasoning: {strategy.get('reasoning', '')}")
+            lines.append(f"Priority: {strategy['priority'].upper()}")
+            lines.append(f"Reasoning: {strategy.get('reasoning', '')}")
         if strategy.get('advice'):
-            print(f"Advice: {strategy['advice']}")
-        print()
+            lines.append(f"Advice: {strategy['advice']}")
+        lines.append("")
     
     # Wildcard
     if 'wildcard' in result:
         wc = result['wildcard']
-        print("\nWILDCARD:")
-        print("-" * 70)
+        lines.append("\nWILDCARD:")
+        lines.append("-" * 70)
         if 'error' not in wc:
-            print(f"Recommended: {'YES' if wc['recommended'] else 'NO'}")
-            print(f"Current Expected: {wc['current_expected_points']:.1f} points")
-            print(f"Optimal Expected: {wc['optimal_expected_points']:.1f} points")
-            print(f"Improvement: +{wc['improvement']:.1f} points")
-            print(f"Reasoning: {wc['reasoning']}")
+            lines.append(f"Recommended: {'YES' if wc['recommended'] else 'NO'}")
+            lines.append(f"Current Expected: {wc['current_expected_points']:.1f} points")
+            if wc.get('improvement_upper_bound') is not None:
+                lines.append(f"Improvement: at most +{wc['improvement_upper_bound']:.1f} points")
+            else:
+                lines.append(f"Optimal Expected: {wc['optimal_expected_points']:.1f} points")
+                lines.append(f"Improvement: +{wc['improvement']:.1f} points")
+            lines.append(f"Reasoning: {wc['reasoning']}")
+        else:
+            lines.append(f"Error: {wc['error']}")
     
     # Triple Captain
     if 'triple_captain' in result:
         tc = result['triple_captain']
-        print("\nTRIPLE CAPTAIN:")
-        print("-" * 70)
-        print(f"Recommended: {'YES' if tc['recommended'] else 'NO'}")
-        print(f"Reason: {tc['reason']}")
-        print(f"Reasoning: {tc['reasoning']}")
-        if 'player' in tc:
-            player = tc['player']
-            if isinstance(player, dict) and 'name' in player:
-                print(f"Best Player: {player['name']} (EP: {player.get('expected_points', 0):.1f})")
+        lines.append("\nTRIPLE CAPTAIN:")
+        lines.append("-" * 70)
+        if 'error' not in tc:
+            lines.append(f"Recommended: {'YES' if tc['recommended'] else 'NO'}")
+            lines.append(f"Reason: {tc['reason']}")
+            lines.append(f"Reasoning: {tc['reasoning']}")
+            if 'player' in tc:
+                player = tc['player']
+                if isinstance(player, dict) and 'name' in player:
+                    lines.append(f"Best Player: {player['name']} (EP: {player.get('expected_points', 0):.1f})")
+        else:
+            lines.append(f"Error: {tc['error']}")
     
     # Bench Boost
     if 'bench_boost' in result:
         bb = result['bench_boost']
-        print("\nBENCH BOOST:")
-        print("-" * 70)
-        print(f"Recommended: {'YES' if bb['recommended'] else 'NO'}")
-        print(f"Reason: {bb['reason']}")
-        print(f"Bench Expected Points: {bb['bench_expected_points']:.1f}")
-        print(f"Double Gameweek: {'Yes' if bb['double_gameweek'] else 'No'}")
+        lines.append("\nBENCH BOOST:")
+        lines.append("-" * 70)
+        if 'error' not in bb:
+            lines.append(f"Recommended: {'YES' if bb['recommended'] else 'NO'}")
+            lines.append(f"Reason: {bb['reason']}")
+            lines.append(f"Bench Expected Points: {bb['bench_expected_points']:.1f}")
+            lines.append(f"Double Gameweek: {'Yes' if bb['double_gameweek'] else 'No'}")
+        else:
+            lines.append(f"Error: {bb['error']}")
     
     # Free Hit
     if 'free_hit' in result:
         fh = result['free_hit']
-        print("\nFREE HIT:")
-        print("-" * 70)
-        print(f"Recommended: {'YES' if fh['recommended'] else 'NO'}")
-        print(f"Reason: {fh['reason']}")
-        if 'current_expected_points' in fh:
-            print(f"Current Expected: {fh['current_expected_points']:.1f} points")
-            print(f"Difficult Fixtures: {fh.get('difficult_fixtures_count', 0)}")
-            print(f"DGW Teams: {fh.get('dgw_teams', 0)}")
+        lines.append("\nFREE HIT:")
+        lines.append("-" * 70)
+        if 'error' not in fh:
+            lines.append(f"Recommended: {'YES' if fh['recommended'] else 'NO'}")
+            lines.append(f"Reason: {fh['reason']}")
+            if 'current_expected_points' in fh:
+                lines.append(f"Current Expected: {fh['current_expected_points']:.1f} points")
+                lines.append(f"Difficult Fixtures: {fh.get('difficult_fixtures_count', 0)}")
+                lines.append(f"DGW Teams: {fh.get('dgw_teams', 0)}")
+        else:
+            lines.append(f"Error: {fh['error']}")
+    
+    write_lines(lines)
 
 
 def print_value_players(analyzer: PlayerAnalyzer):
     """Print best value players"""
-    print_section("BEST VALUE PLAYERS")
+    lines = section_lines("BEST VALUE PLAYERS")
     
     positions = {1: "Goalkeepers", 2: "Defenders", 3: "Midfielders", 4: "Forwards"}
     position_map = {1: "GK", 2: "DEF", 3: "MID", 4: "FWD"}
     
     for pos_id in [1, 2, 3, 4]:
-        print(f"\n{positions[pos_id]}:")
-        print("-" * 70)
+        lines.append(f"\n{positions[pos_id]}:")
+        lines.append("-" * 70)
         
         value_players = analyzer.get_value_players(position=pos_id, limit=5)
         
-        for _, player in value_players.iterrows():
-            print(f"  {player['web_name']:20} ({player['team_name']:15}) "
-                  f"£{player['now_cost']/10:.1f}m  "
-                  f"EP: {player['expected_points']:.1f}  "
-                  f"Value: {player['value']:.2f}")
+        for player in value_players.itertuples(index=False):
+            lines.append(f"  {player.web_name:20} ({player.team_name:15}) "
+                         f"£{player.now_cost/10:.1f}m  "
+                         f"EP: {player.expected_points:.1f}  "
+                         f"Value: {player.value:.2f}")
+    
+    write_lines(lines)
 
 
 def main():
@@ -263,6 +297,7 @@ Examples:
     parser.add_argument('--all', action='store_true', help='Show all recommendations')
     parser.add_argument('--num-transfers', type=int, default=1, help='Number of transfers to suggest')
     parser.add_argument('--horizon', type=int, default=5, help='Number of gameweeks to optimize for')
+    parser.add_argument('--refresh', action='store_true', help='Fetch fresh data instead of using cached API responses')
     
     args = parser.parse_args()
     
@@ -278,15 +313,33 @@ Examples:
         # Initialize components
         api = FPLApi()
         analyzer = PlayerAnalyzer(api)
-        analyzer.load_data()
-        
-        optimizer = TeamOptimizer(api, analyzer)
-        transfer_suggester = TransferSuggester(api, analyzer, optimizer)
-        captain_selector = CaptainSelector(api, analyzer)
-        chip_advisor = ChipAdvisor(api, analyzer, transfer_suggester, captain_selector)
+        analyzer.load_data(force_refresh=args.refresh)
         
         print("Data loaded successfully!\n")
         
+        # Team analyses only run when there is a team to analyse
+        has_team = bool(args.team_id)
+        wants_lineup = has_team and (args.all or args.suggest_lineup)
+        wants_transfers = has_team and (args.all or args.suggest_transfers)
+        wants_captain = has_team and (args.all or args.suggest_captain)
+        wants_chips = has_team and (args.all or args.suggest_chips)
+        
+        # Only import and build what the requested analyses use; the optimizer
+        # pulls in PuLP, which is slow to import
+        optimizer = transfer_suggester = captain_selector = chip_advisor = None
+        if args.optimal_squad or wants_lineup or wants_transfers or wants_chips:
+            from team_optimizer import TeamOptimizer
+            optimizer = TeamOptimizer(api, analyzer)
+        if wants_transfers or wants_chips:
+            from transfer_suggester import TransferSuggester
+            transfer_suggester = TransferSuggester(api, analyzer, optimizer)
+        if wants_captain or wants_chips:
+            from captain_selector import CaptainSelector
+            captain_selector = CaptainSelector(api, analyzer)
+        if wants_chips:
+            from chip_advisor import ChipAdvisor
+            chip_advisor = ChipAdvisor(api, analyzer, transfer_suggester, captain_selector)
+        
         # Execute requested analyses
         if args.optimal_squad:
             result = optimizer.optimize_squad(horizon=args.horizon)
@@ -296,28 +349,29 @@ Examples:
             print_value_players(analyzer)
         
         if args.team_id:
-            # Get current squad
-            current_gw = api.get_current_gameweek()
-            picks_data = api.get_team_picks(args.team_id, current_gw)
-            current_squad = [pick['element'] for pick in picks_data['picks']]
+            if wants_lineup or wants_transfers or wants_captain:
+                # Get current squad, shared by the analyses below
+                current_gw, picks_data = api.prefetch_squad(args.team_id)
+                current_squad = [pick['element'] for pick in picks_data['picks']]
             
-            if args.all or args.suggest_lineup:
+            if wants_lineup:
                 result = optimizer.optimize_starting_xi(current_squad)
                 print_starting_xi(result)
             
-            if args.all or args.suggest_transfers:
+            if wants_transfers:
                 result = transfer_suggester.suggest_transfers(
                     args.team_id,
                     num_transfers=args.num_transfers,
-                    horizon=args.horizon
+                    horizon=args.horizon,
+                    picks_data=picks_data
                 )
                 print_transfers(result)
             
-            if args.all or args.suggest_captain:
+            if wants_captain:
                 result = captain_selector.suggest_captain(current_squad)
                 print_captain(result)
             
-            if args.all or args.suggest_chips:
+            if wants_chips:
                 result = chip_advisor.get_chip_recommendations(args.team_id)
                 print_chips(result)
         
@@ -3,37 +3,282 @@ Player Analysis Module - Analyzes player performance and calculates expected poi
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple, Optional
 from fpl_api import FPLApi
 
 
+def numeric_array(column: pd.Series) -> np.ndarray:
+    """Coerce an FPL API column (often numeric strings) to a float array, blanks as 0"""
+    return pd.to_numeric(column, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def top_k_indices(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k largest values, highest first.
+
+    Uses a partial partition instead of a full sort; ties are broken by the
+    earlier position, matching DataFrame.nlargest(keep='first').
+    """
+    values = np.asarray(values)
+    n = len(values)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        kth = np.partition(values, n - k)[n - k]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[:k - len(above)]
+        idx = np.sort(np.concatenate([above, ties]))
+    else:
+        idx = np.arange(n)
+
+    return idx[np.argsort(-values[idx], kind='stable')]
+
+
+class PlayerTable(NamedTuple):
+    """
+    Per-player columns as contiguous arrays indexed directly by player ID.
+    Slots for IDs without a player hold zeros / empty strings (id 0).
+    """
+    id: np.ndarray
+    team: np.ndarray
+    element_type: np.ndarray
+    now_cost: np.ndarray
+    web_name: np.ndarray
+    team_name: np.ndarray
+    # Expected points inputs
+    form: np.ndarray
+    points_per_game: np.ndarray
+    ep_next: np.ndarray
+    minutes: np.ndarray
+    starts: np.ndarray
+    # Row of each player in players_df, for reading row-aligned arrays (-1 if none)
+    row: np.ndarray
+    
+    @classmethod
+    def from_frame(cls, players: pd.DataFrame) -> 'PlayerTable':
+        """Scatter the player frame's columns into ID-indexed arrays"""
+        ids = players['id'].to_numpy()
+        size = int(ids.max()) + 1 if len(ids) else 1
+        
+        def scatter(data: np.ndarray, dtype, fill) -> np.ndarray:
+            values = np.full(size, fill, dtype=dtype)
+            values[ids] = data
+            return values
+        
+        def column(name: str, dtype, fill) -> np.ndarray:
+            return scatter(players[name].to_numpy(dtype=dtype), dtype, fill)
+        
+        return cls(
+            id=column('id', np.int32, 0),
+            team=column('team', np.int8, 0),
+            element_type=column('element_type', np.int8, 0),
+            now_cost=column('now_cost', np.int16, 0),
+            web_name=column('web_name', object, ''),
+            team_name=column('team_name', object, ''),
+            form=column('form', np.float64, 0),
+            points_per_game=column('points_per_game', np.float64, 0),
+            ep_next=column('ep_next', np.float64, 0),
+            minutes=column('minutes', np.int32, 0),
+            starts=column('starts', np.int32, 0),
+            row=scatter(np.arange(len(ids)), np.int32, -1)
+        )
+    
+    def known_ids(self, player_ids) -> np.ndarray:
+        """Sorted unique player IDs from the input that exist in the table"""
+        ids = np.unique(np.asarray(list(player_ids), dtype=np.int64))
+        ids = ids[(ids > 0) & (ids < len(self.id))]
+        return ids[self.id[ids] == ids]
+    
+    def row_mask(self, player_ids) -> np.ndarray:
+        """Boolean mask over players_df rows selecting the known IDs from the input"""
+        mask = np.zeros(np.count_nonzero(self.row >= 0), dtype=bool)
+        mask[self.row[self.known_ids(player_ids)]] = True
+        return mask
+    
+    def checked_ids(self, player_ids) -> np.ndarray:
+        """The input IDs as an index array, raising KeyError if any is not in the table"""
+        ids = np.asarray(player_ids, dtype=np.int64)
+        in_range = (ids > 0) & (ids < len(self.id))
+        known = in_range & (self.id[np.where(in_range, ids, 0)] == ids)
+        if not known.all():
+            raise KeyError(ids[~known].tolist())
+        return ids
+
+
 class PlayerAnalyzer:
     """Analyzes player data to predict future performance"""
     
-    def __init__(self, api: FPLApi):
+    # Columns the FPL API delivers as numeric strings; cast once at load time
+    NUMERIC_COLUMNS = (
+        'form', 'ep_next', 'ep_this', 'points_per_game', 'selected_by_percent',
+        'threat', 'creativity', 'influence', 'ict_index', 'value_form', 'value_season',
+        'expected_goals', 'expected_assists', 'expected_goal_involvements',
+        'expected_goals_conceded'
+    )
+    
+    # Small-range integer columns narrowed to compact dtypes
+    INTEGER_DTYPES = {
+        'id': 'int32', 'team': 'int16', 'element_type': 'int8',
+        'now_cost': 'int32', 'minutes': 'int32', 'starts': 'int32'
+    }
+    
+    # Horizon whose expected points are precomputed on every load
+    EXPECTED_POINTS_HORIZON = 1
+    
+    # Expected points for horizons 1..EP_MATRIX_HORIZONS are computed on every load
+    EP_MATRIX_HORIZONS = 8
+    
+    # Attributes set by a data load, published together by load_data
+    DATA_ATTRIBUTES = (
+        'current_gw', 'players_df', 'players_by_id', 'player_table',
+        'available_mask', 'selectable_mask', 'teams_df', 'fixtures_df', 'fixtures_by_event',
+        'ep_matrix', 'expected_points_by_id', 'expected_points_horizon'
+    )
+    
+    # Per-week weight applied to later gameweeks: one free transfer a week means
+    # roughly one player in 15 is swapped out before each further gameweek
+    DEFAULT_DISCOUNT = 14 / 15
+    
+    def __init__(self, api: FPLApi, discount: float = DEFAULT_DISCOUNT):
         self.api = api
+        self.discount = discount
         self.players_df = None
+        self.players_by_id = None
+        self.player_table = None
+        # Row masks over players_df: status 'a', and also likely to play next round
+        self.available_mask = np.zeros(0, dtype=bool)
+        self.selectable_mask = np.zeros(0, dtype=bool)
         self.teams_df = None
         self.fixtures_df = None
+        self.fixtures_by_event = {}
+        # Gameweek the loaded data is analyzed for, fixed at load time
+        self.current_gw = None
+        # Precomputed expected points for one horizon, keyed by player ID
+        self.expected_points_by_id: Dict[int, float] = {}
+        self.expected_points_horizon = None
+        # Expected points per player (rows) and horizon (columns), computed at load time
+        self.ep_matrix = np.zeros((0, 1))
+        # Bumped on every load so memoized results from older data are not reused
+        self.data_version = 0
+        self._get_dgw_teams_cached = lru_cache(maxsize=64)(self._get_dgw_teams)
+        self._get_dgw_team_mask_cached = lru_cache(maxsize=64)(self._get_dgw_team_mask)
+        self._build_team_difficulty_table_cached = lru_cache(maxsize=64)(self._build_team_difficulty_table)
+        self._build_team_multiplier_table_cached = lru_cache(maxsize=64)(self._build_team_multiplier_table)
+        self._get_expected_points_cached = lru_cache(maxsize=64)(self._get_expected_points)
+        self._get_expected_points_by_id_cached = lru_cache(maxsize=16)(self._get_expected_points_by_id)
+        
+    def load_data(self, force_refresh: bool = False):
+        """
+        Load and prepare player and team data.
+        API responses may come from the client's caches unless force_refresh is set.
+        
+        The data is prepared on a separate analyzer and then published here, so
+        readers of this one never see a half-loaded mix of old and new tables.
+        """
+        staged = type(self)(self.api, self.discount)
+        staged._load_data(force_refresh)
+        for name in self.DATA_ATTRIBUTES:
+            setattr(self, name, getattr(staged, name))
+        # Bumped last: memos filled while the data was being replaced are keyed
+        # by the previous version and never reused
+        self.data_version += 1
+    
+    def _load_data(self, force_refresh: bool):
+        """Fetch and prepare the data on this (freshly constructed) analyzer"""
+        # Fetch bootstrap and fixtures data concurrently. A short-lived pool leaves no
+        # threads behind, so this is safe before a pre-fork server spawns workers.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fixtures_future = executor.submit(self.api.get_fixtures_df, force_refresh)
+            self.api.get_bootstrap_data(force_refresh)
+            fixtures_df = fixtures_future.result()
+        self.current_gw = self.api.get_current_gameweek()
         
-    def load_data(self):
-        """Load and prepare player and team data"""
         # Load players
         players = self.api.get_players()
         self.players_df = pd.DataFrame(players)
+        for col in self.NUMERIC_COLUMNS:
+            if col in self.players_df:
+                self.players_df[col] = numeric_array(self.players_df[col])
+        self.players_df = self.players_df.astype(
+            {col: dtype for col, dtype in self.INTEGER_DTYPES.items() if col in self.players_df}
+        ).sort_values('id', ignore_index=True)
         
         # Load teams
         teams = self.api.get_teams()
         self.teams_df = pd.DataFrame(teams)
         
         # Load fixtures
-        fixtures = self.api.get_fixtures()
-        self.fixtures_df = pd.DataFrame(fixtures)
+        self.fixtures_df = fixtures_df
+        self.fixtures_by_event = {
+            int(event): event_fixtures for event, event_fixtures in self.fixtures_df.groupby('event')
+        }
         
         # Add team names to players
         team_map = dict(zip(self.teams_df['id'], self.teams_df['name']))
-        self.players_df['team_name'] = self.players_df['team'].map(team_map)
+        self.players_df['team_name'] = self.players_df['team'].map(team_map).astype('category')
+        
+        # ID-indexed view for hash lookups instead of full-frame boolean masks;
+        # the index is sorted so lookups can also binary search
+        self.players_by_id = self.players_df.set_index('id', drop=False)
+        self.player_table = PlayerTable.from_frame(self.players_df)
+        
+        # Availability filters shared by the optimizers and suggesters
+        chance = self.players_df['chance_of_playing_next_round']
+        available = (self.players_df['status'] == 'a').to_numpy()
+        selectable = available & (chance.isna() | (chance >= 75)).to_numpy()
+        available.flags.writeable = False
+        selectable.flags.writeable = False
+        self.available_mask, self.selectable_mask = available, selectable
         
+        self._compute_ep_matrix()
+        self.precompute_expected_points()
+        
+    def get_players_by_ids(self, player_ids) -> pd.DataFrame:
+        """
+        Look up several players by ID using the id-indexed view.
+        Unknown IDs are ignored and rows are returned in ID order.
+        """
+        ids = self.players_by_id.index.intersection(pd.Index(list(player_ids)))
+        return self.players_by_id.loc[ids.sort_values()]
+    
+    def get_dgw_teams(self, gameweek: int) -> np.ndarray:
+        """
+        Get the IDs of teams with two or more fixtures in a gameweek.
+        Results are memoized per gameweek and data load; the array is read-only.
+        """
+        return self._get_dgw_teams_cached(gameweek, self.data_version)
+    
+    def _get_dgw_teams(self, gameweek: int, data_version: int) -> np.ndarray:
+        """Uncached double gameweek lookup; the data version only keys the cache"""
+        gw_fixtures = self.fixtures_by_event.get(gameweek)
+        if gw_fixtures is None:
+            teams = np.empty(0, dtype=np.int64)
+        else:
+            fixture_counts = pd.concat([gw_fixtures['team_h'], gw_fixtures['team_a']]).value_counts()
+            teams = fixture_counts.index[fixture_counts >= 2].to_numpy()
+        teams.flags.writeable = False
+        return teams
+    
+    def get_dgw_team_mask(self, gameweek: int) -> np.ndarray:
+        """
+        Get a boolean lookup table indexed by team ID, True for teams with a double gameweek.
+        Index it with an array of team IDs instead of testing set membership.
+        """
+        return self._get_dgw_team_mask_cached(gameweek, self.data_version)
+    
+    def _get_dgw_team_mask(self, gameweek: int, data_version: int) -> np.ndarray:
+        """Uncached double gameweek mask; the data version only keys the cache"""
+        teams = self.get_dgw_teams(gameweek)
+        size = int(max(self.teams_df['id'].max(), teams.max(initial=0))) + 1
+        mask = np.zeros(size, dtype=bool)
+        mask[teams] = True
+        mask.flags.writeable = False
+        return mask
+    
     def calculate_expected_points(self, player_id: int, num_gameweeks: int = 5) -> float:
         """
         Calculate expected points for a player over the next N gameweeks.
@@ -42,56 +287,163 @@ class PlayerAnalyzer:
         - Season points per game
         - Fixture difficulty
         - Minutes played tendency
+        
+        Each gameweek after the next is weighted by a further factor of the discount.
+        Values are looked up from a per-horizon table memoized per data load.
+        """
+        if num_gameweeks == self.expected_points_horizon:
+            return self.expected_points_by_id[player_id]
+        return self.get_expected_points_by_id(num_gameweeks)[player_id]
+    
+    def get_expected_points_by_id(self, num_gameweeks: int = 5) -> Dict[int, float]:
+        """
+        Get expected points over the next N gameweeks keyed by player ID.
+        Mappings are memoized per gameweek, horizon and data load; don't modify them.
+        """
+        return self._get_expected_points_by_id_cached(self.current_gw, num_gameweeks, self.data_version)
+    
+    def _get_expected_points_by_id(self, gameweek: int, num_gameweeks: int, data_version: int) -> Dict[int, float]:
+        """Uncached expected points mapping; the gameweek and data version only key the cache"""
+        expected_points = self.get_expected_points(num_gameweeks)
+        return dict(zip(self.players_df['id'].tolist(), expected_points.tolist()))
+    
+    def precompute_expected_points(self, horizon: int = EXPECTED_POINTS_HORIZON):
+        """
+        Compute expected points for every player once, storing them as the
+        'expected_points' column of players_df and in expected_points_by_id.
+        """
+        self.players_df['expected_points'] = self.get_expected_points(horizon)
+        self.expected_points_by_id = self.get_expected_points_by_id(horizon)
+        self.expected_points_horizon = horizon
+    
+    def get_expected_points(self, num_gameweeks: int = 5) -> np.ndarray:
+        """
+        Get expected points for all players over the next N gameweeks, aligned
+        with the rows of players_df. Horizons up to EP_MATRIX_HORIZONS are read
+        from the table computed at load time, longer ones are memoized per
+        gameweek, horizon and data load; the array is read-only.
         """
-        player = self.players_df[self.players_df['id'] == player_id].iloc[0]
+        # Whole-number horizons given as floats (e.g. 5.0 from JSON) use the table too
+        horizon = int(num_gameweeks)
+        if horizon == num_gameweeks and 0 < horizon < self.ep_matrix.shape[1]:
+            return self.ep_matrix[:, horizon]
+        return self._get_expected_points_cached(self.current_gw, num_gameweeks, self.data_version)
+    
+    def _compute_ep_matrix(self, max_horizon: int = EP_MATRIX_HORIZONS):
+        """
+        Compute expected points for every player and every horizon up to max_horizon
+        in one go. Row i is players_df row i and column h the next h gameweeks
+        (column 0 is all zeros).
+        """
+        ids = self.players_df['id'].to_numpy()
+        ep_matrix = np.zeros((len(ids), max_horizon + 1))
+        for horizon in range(1, max_horizon + 1):
+            ep_matrix[:, horizon] = self.calculate_expected_points_batch(ids, horizon)
+        ep_matrix.flags.writeable = False
+        self.ep_matrix = ep_matrix
+    
+    def _get_expected_points(self, gameweek: int, num_gameweeks: int, data_version: int) -> np.ndarray:
+        """Uncached expected points table; the gameweek and data version only key the cache"""
+        expected_points = self.calculate_expected_points_batch(
+            self.players_df['id'].to_numpy(), num_gameweeks
+        )
+        expected_points.flags.writeable = False
+        return expected_points
+    
+    def calculate_expected_points_batch(self, player_ids, num_gameweeks: int = 5) -> np.ndarray:
+        """
+        Vectorized version of calculate_expected_points for many players at once.
         
-        # Base expected points from form and season average
-        form = float(player['form']) if player['form'] else 0
-        ep_next = float(player['ep_next']) if player['ep_next'] else 0
-        points_per_game = float(player['points_per_game']) if player['points_per_game'] else 0
+        Args:
+            player_ids: Sequence of player IDs
+            num_gameweeks: Number of gameweeks to consider
+            
+        Returns:
+            Array of expected points aligned with player_ids
+        """
+        table = self.player_table
+        ids = table.checked_ids(player_ids)
         
-        # Weight recent form more heavily
+        # Base expected points from form and season average
+        form = table.form[ids]
+        ep_next = table.ep_next[ids]
+        points_per_game = table.points_per_game[ids]
         base_ep = (form * 0.5) + (points_per_game * 0.3) + (ep_next * 0.2)
         
         # Adjust for fixture difficulty
-        fixture_difficulty = self._get_fixture_difficulty(player['team'], num_gameweeks)
-        difficulty_multiplier = self._difficulty_to_multiplier(fixture_difficulty)
+        team_multiplier = self.get_team_multiplier(self.current_gw, num_gameweeks)
+        difficulty_multiplier = team_multiplier[table.team[ids]]
         
         # Adjust for minutes played (availability)
-        minutes_played = float(player['minutes'])
-        starts = player['starts'] if player['starts'] > 0 else 1
-        total_possible = 90 * starts
-        availability = min(minutes_played / total_possible, 1.0) if total_possible > 0 else 0.5
+        minutes_played = table.minutes[ids].astype(float)
+        starts = table.starts[ids].astype(float)
+        total_possible = 90 * np.where(starts > 0, starts, 1)
+        availability = np.minimum(minutes_played / total_possible, 1.0)
         
-        # Calculate final expected points
-        expected_points = base_ep * difficulty_multiplier * availability * num_gameweeks
+        expected_points = base_ep * difficulty_multiplier * availability * self._horizon_weight(num_gameweeks)
         
-        return max(expected_points, 0)
+        return np.maximum(expected_points, 0)
+    
+    def _horizon_weight(self, num_gameweeks: int) -> float:
+        """Total weight of N gameweeks, discounted per week ahead: sum(discount ** w for w < N)"""
+        if self.discount == 1:
+            return float(num_gameweeks)
+        return (1 - self.discount ** num_gameweeks) / (1 - self.discount)
     
     def _get_fixture_difficulty(self, team_id: int, num_gameweeks: int) -> float:
         """Get average fixture difficulty for a team over next N gameweeks"""
-        current_gw = self.api.get_current_gameweek()
-        
-        # Filter fixtures for this team in upcoming gameweeks
-        team_fixtures = self.fixtures_df[
-            (self.fixtures_df['event'] >= current_gw) &
-            (self.fixtures_df['event'] < current_gw + num_gameweeks) &
-            ((self.fixtures_df['team_h'] == team_id) | (self.fixtures_df['team_a'] == team_id))
+        return float(self._get_fixture_difficulty_batch([team_id], num_gameweeks)[0])
+    
+    def _get_fixture_difficulty_batch(self, team_ids, num_gameweeks: int) -> np.ndarray:
+        """
+        Get average fixture difficulty for several teams over next N gameweeks.
+        Teams without fixtures are neutral (3.0).
+        """
+        team_difficulty = self.get_team_difficulty(self.current_gw, num_gameweeks)
+        return team_difficulty[np.asarray(team_ids)]
+    
+    def get_team_difficulty(self, gameweek: int, num_gameweeks: int) -> np.ndarray:
+        """
+        Get average fixture difficulty per team over N gameweeks starting at the given one,
+        as a lookup table indexed by team ID (3.0 for teams without fixtures).
+        Tables are memoized per gameweek, horizon and data load; the array is read-only.
+        """
+        return self._build_team_difficulty_table_cached(gameweek, num_gameweeks, self.data_version)
+    
+    def get_team_multiplier(self, gameweek: int, num_gameweeks: int) -> np.ndarray:
+        """
+        Get the expected points multiplier for each team's fixtures over N gameweeks,
+        indexed by team ID. Memoized like get_team_difficulty; the array is read-only.
+        """
+        return self._build_team_multiplier_table_cached(gameweek, num_gameweeks, self.data_version)
+    
+    def _build_team_multiplier_table(self, gameweek: int, num_gameweeks: int, data_version: int) -> np.ndarray:
+        """Uncached multiplier table; the data version only keys the cache"""
+        table = self._difficulty_to_multiplier(self.get_team_difficulty(gameweek, num_gameweeks))
+        table.flags.writeable = False
+        return table
+    
+    def _build_team_difficulty_table(self, gameweek: int, num_gameweeks: int, data_version: int) -> np.ndarray:
+        """Uncached difficulty table; the data version only keys the cache"""
+        upcoming = self.fixtures_df[
+            (self.fixtures_df['event'] >= gameweek) &
+            (self.fixtures_df['event'] < gameweek + num_gameweeks)
         ]
         
-        if len(team_fixtures) == 0:
-            return 3.0  # Neutral difficulty
+        # One row per team per fixture: home games use the home difficulty, away games the away one
+        columns = ['team', 'difficulty']
+        difficulties = pd.concat([
+            upcoming[['team_h', 'team_h_difficulty']].set_axis(columns, axis=1),
+            upcoming[['team_a', 'team_a_difficulty']].set_axis(columns, axis=1)
+        ])
+        mean_difficulty = difficulties.groupby('team')['difficulty'].mean()
         
-        difficulties = []
-        for _, fixture in team_fixtures.iterrows():
-            if fixture['team_h'] == team_id:
-                # Home game - use away team difficulty
-                difficulties.append(fixture['team_h_difficulty'])
-            else:
-                # Away game - use home team difficulty
-                difficulties.append(fixture['team_a_difficulty'])
-        
-        return np.mean(difficulties) if difficulties else 3.0
+        teams = mean_difficulty.index.to_numpy()
+        size = int(max(self.teams_df['id'].max(), teams.max(initial=0))) + 1
+        table = np.full(size, 3.0)
+        table[teams] = mean_difficulty.to_numpy(dtype=float)
+        table.flags.writeable = False
+        return table
     
     def _difficulty_to_multiplier(self, difficulty: float) -> float:
         """Convert fixture difficulty rating to expected points multiplier"""
@@ -107,26 +459,28 @@ class PlayerAnalyzer:
             position: Filter by position (1=GK, 2=DEF, 3=MID, 4=FWD)
             limit: Number of players to return
         """
-        df = self.players_df.copy()
-        
-        # Filter by position if specified
-        if position:
-            df = df[df['element_type'] == position]
+        df = self.players_df
         
-        # Calculate expected points for next gameweek
-        df['expected_points'] = df['id'].apply(lambda x: self.calculate_expected_points(x, 1))
+        # Expected points for next gameweek, precomputed for every player
+        expected_points = self.get_expected_points(1)
         
         # Calculate value (points per million)
-        df['value'] = df['expected_points'] / (df['now_cost'] / 10)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = expected_points / (df['now_cost'].to_numpy() / 10)
         
-        # Filter out unavailable players
-        df = df[df['status'] == 'a']  # 'a' = available
-        df = df[df['chance_of_playing_next_round'].isna() | (df['chance_of_playing_next_round'] >= 75)]
+        # Filter out unavailable players, and by position if specified
+        eligible = self.selectable_mask
+        if position:
+            eligible = eligible & (df['element_type'].to_numpy() == position)
+        rows = np.flatnonzero(eligible & ~np.isnan(value))
         
-        # Sort by value and return top N
-        result = df.nlargest(limit, 'value')[
-            ['web_name', 'team_name', 'element_type', 'now_cost', 'expected_points', 'value', 'form']
-        ]
+        # Top N by value without sorting the whole table
+        rows = rows[top_k_indices(value[rows], limit)]
+        result = df.iloc[rows][['web_name', 'team_name', 'element_type', 'now_cost']].assign(
+            expected_points=expected_points[rows],
+            value=value[rows],
+            form=df['form'].to_numpy()[rows]
+        )
         
         return result
     
@@ -141,7 +495,7 @@ class PlayerAnalyzer:
         Returns:
             Dictionary with player scores and metrics
         """
-        player = self.players_df[self.players_df['id'] == player_id].iloc[0]
+        player = self.players_by_id.loc[player_id]
         
         expected_points = self.calculate_expected_points(player_id, horizon)
         cost = player['now_cost'] / 10  # Convert to actual price
@@ -154,7 +508,7 @@ class PlayerAnalyzer:
             'cost': cost,
             'expected_points': expected_points,
             'value': expected_points / cost if cost > 0 else 0,
-            'form': float(player['form']) if player['form'] else 0,
+            'form': float(player['form']),
             'total_points': player['total_points'],
             'selected_by_percent': float(player['selected_by_percent'])
         }
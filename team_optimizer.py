@@ -1,11 +1,96 @@
 """
 Team Optimizer - Uses linear programming to select the optimal FPL team
 """
+import itertools
+import os
 import pulp
+import numpy as np
 import pandas as pd
+import threading
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from fpl_api import FPLApi
-from player_analyzer import PlayerAnalyzer
+from player_analyzer import PlayerAnalyzer, top_k_indices
+
+
+def solution_mask(variables: List[pulp.LpVariable]) -> np.ndarray:
+    """
+    Boolean array of which binary variables are set in the last solution.
+    Solvers report binaries as floats near 0 or 1; unsolved variables count as 0.
+    """
+    values = np.fromiter((var.varValue or 0.0 for var in variables), dtype=float, count=len(variables))
+    return values > 0.5
+
+
+class _SquadModel:
+    """
+    Squad selection MILP over a fixed pool of players.
+    Variables and the squad size, position and team constraints are built once;
+    each solve only swaps the objective and the budget right-hand side.
+    """
+    
+    def __init__(
+        self, 
+        players_df: pd.DataFrame, 
+        available: np.ndarray, 
+        squad_size: int, 
+        team_positions: Dict[int, Tuple[int, int]], 
+        max_players_per_team: int, 
+        budget: int
+    ):
+        # Mask over players_df selecting the pool; only the needed columns are sliced
+        self.available = available
+        self.ids = players_df['id'].to_numpy()[available]
+        self.costs = players_df['now_cost'].to_numpy()[available]
+        self.positions = players_df['element_type'].to_numpy()[available]
+        self.names = players_df['web_name'].to_numpy()[available]
+        self.team_names = players_df['team_name'].to_numpy()[available]
+        teams = players_df['team'].to_numpy()[available]
+        self.lock = threading.Lock()
+        
+        self.prob = pulp.LpProblem("FPL_Squad_Selection", pulp.LpMaximize)
+        
+        # Decision variables: binary variable for each player
+        self.player_vars = [
+            pulp.LpVariable(f"player_{player_id}", cat='Binary') for player_id in self.ids.tolist()
+        ]
+        
+        # Constraint 1: Total squad size
+        self.prob += pulp.lpSum(self.player_vars) == squad_size
+        
+        # Constraint 2: Budget (right-hand side replaced per solve)
+        self.prob += pulp.lpSum(
+            var * cost for var, cost in zip(self.player_vars, self.costs.tolist())
+        ) <= budget, "budget"
+        self.budget_constraint = self.prob.constraints["budget"]
+        
+        # Constraint 3: Position requirements
+        for position, (min_count, max_count) in team_positions.items():
+            position_vars = [self.player_vars[i] for i in np.flatnonzero(self.positions == position)]
+            self.prob += pulp.lpSum(position_vars) >= min_count
+            self.prob += pulp.lpSum(position_vars) <= max_count
+        
+        # Constraint 4: Max players per team
+        for team_id in pd.unique(teams):
+            team_vars = [self.player_vars[i] for i in np.flatnonzero(teams == team_id)]
+            self.prob += pulp.lpSum(team_vars) <= max_players_per_team
+    
+    def set_objective(self, points: np.ndarray):
+        """Maximize the given expected points, aligned with the pool"""
+        self.prob.setObjective(
+            pulp.lpSum(var * ep for var, ep in zip(self.player_vars, points.tolist()))
+        )
+    
+    def set_budget(self, budget: int):
+        self.budget_constraint.changeRHS(budget)
+    
+    def solve(self, solver: pulp.LpSolver) -> int:
+        """Solve the model, returning the PuLP status code"""
+        return self.prob.solve(solver)
+    
+    def selected(self) -> np.ndarray:
+        """Pool positions of the players in the last solution"""
+        return np.flatnonzero(solution_mask(self.player_vars))
 
 
 class TeamOptimizer:
@@ -22,6 +107,12 @@ class TeamOptimizer:
     }
     MAX_PLAYERS_PER_TEAM = 3
     
+    # Branch-and-bound threads per solve; leave a core for the rest of the process
+    SOLVER_THREADS = int(os.environ.get('FPL_SOLVER_THREADS', max(1, (os.cpu_count() or 1) - 1)))
+    
+    # Objective bonus per kept player in transfer planning, far below any real points gain
+    TRANSFER_TIE_BREAK = 1e-6
+    
     # Starting 11 constraints
     STARTING_XI_SIZE = 11
     FORMATION_CONSTRAINTS = {
@@ -34,10 +125,47 @@ class TeamOptimizer:
     def __init__(self, api: FPLApi, analyzer: PlayerAnalyzer):
         self.api = api
         self.analyzer = analyzer
+        self.solver = self._get_solver()
+        self.formations = self._legal_formations()
+        self._optimize_starting_xi_cached = lru_cache(maxsize=256)(self._optimize_starting_xi)
+        self._get_squad_model_cached = lru_cache(maxsize=2)(self._build_squad_model)
+        self._squad_points_upper_bound_cached = lru_cache(maxsize=16)(self._squad_points_upper_bound)
+        
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_solver() -> pulp.LpSolver:
+        """
+        Pick the fastest installed MILP solver: in-process HiGHS (highspy), the
+        HiGHS executable, Gurobi, and finally the CBC binary bundled with PuLP.
+        Detection runs once per process and the solver instance is shared.
+        """
+        threads = TeamOptimizer.SOLVER_THREADS
+        candidates = (
+            pulp.HiGHS(msg=False, threads=threads),
+            pulp.HiGHS_CMD(msg=False, threads=threads),
+            pulp.GUROBI_CMD(msg=0, threads=threads)
+        )
+        for solver in candidates:
+            if solver.available():
+                return solver
+        return pulp.PULP_CBC_CMD(msg=0, threads=threads)
+        
+    @classmethod
+    def _legal_formations(cls) -> List[Dict[int, int]]:
+        """Every per-position player count allowed in a starting XI"""
+        positions = list(cls.FORMATION_CONSTRAINTS)
+        ranges = [range(low, high + 1) for low, high in cls.FORMATION_CONSTRAINTS.values()]
+        return [
+            dict(zip(positions, counts))
+            for counts in itertools.product(*ranges)
+            if sum(counts) == cls.STARTING_XI_SIZE
+        ]
         
     def optimize_squad(self, budget: Optional[int] = None, horizon: int = 5) -> Dict:
         """
         Optimize squad selection for the next N gameweeks.
+        The model is built once per data load and re-solved with this call's
+        objective and budget.
         
         Args:
             budget: Budget in tenths (default: 1000 = £100.0m)
@@ -49,100 +177,171 @@ class TeamOptimizer:
         if budget is None:
             budget = self.TOTAL_BUDGET
         
-        # Get all available players
-        players_df = self.analyzer.players_df
-        available_players = players_df[
-            (players_df['status'] == 'a') &
-            (players_df['chance_of_playing_next_round'].isna() | 
-             (players_df['chance_of_playing_next_round'] >= 75))
-        ].copy()
-        
-        # Calculate expected points for all players
-        available_players['expected_points'] = available_players['id'].apply(
-            lambda x: self.analyzer.calculate_expected_points(x, horizon)
-        )
+        model = self._get_squad_model_cached(self.analyzer.data_version)
         
-        # Create the optimization problem
-        prob = pulp.LpProblem("FPL_Squad_Selection", pulp.LpMaximize)
+        # Expected points for all available players, computed once per horizon
+        points = self.analyzer.get_expected_points(horizon)[model.available]
         
-        # Decision variables: binary variable for each player
-        player_vars = {}
-        for idx, player in available_players.iterrows():
-            player_vars[player['id']] = pulp.LpVariable(
-                f"player_{player['id']}", 
-                cat='Binary'
+        # The model is shared, so updating and solving it must not interleave
+        with model.lock:
+            model.set_objective(points)
+            model.set_budget(budget)
+            status = model.solve(self.solver)
+            selected = model.selected()
+        
+        costs = model.costs[selected]
+        positions = model.positions[selected]
+        points = points[selected]
+        selected_players = [
+            {
+                'id': player_id,
+                'name': name,
+                'team': team_name,
+                'position': position,
+                'cost': cost / 10,
+                'expected_points': ep
+            }
+            for player_id, name, team_name, position, cost, ep in zip(
+                model.ids[selected], model.names[selected], model.team_names[selected],
+                positions, costs, points
             )
+        ]
+        total_cost = costs.sum()
+        total_expected_points = points.sum()
         
-        # Objective: maximize expected points
-        prob += pulp.lpSum([
-            player_vars[player['id']] * player['expected_points']
-            for _, player in available_players.iterrows()
-        ])
+        return {
+            'players': sorted(selected_players, key=lambda x: (x['position'], -x['expected_points'])),
+            'total_cost': total_cost / 10,
+            'remaining_budget': (budget - total_cost) / 10,
+            'total_expected_points': total_expected_points,
+            'status': pulp.LpStatus[status]
+        }
+    
+    def squad_points_upper_bound(self, horizon: int = 5) -> float:
+        """
+        Cheap upper bound on optimize_squad's total expected points for any budget:
+        the best players for each position's quota, ignoring budget and team limits.
+        Memoized per horizon and data load.
+        """
+        return self._squad_points_upper_bound_cached(horizon, self.analyzer.data_version)
+    
+    def _squad_points_upper_bound(self, horizon: int, data_version: int) -> float:
+        """Uncached squad points bound; the data version only keys the cache"""
+        available = self.analyzer.selectable_mask
+        points = self.analyzer.get_expected_points(horizon)[available]
+        positions = self.analyzer.players_df['element_type'].to_numpy()[available]
         
-        # Constraint 1: Total squad size
-        prob += pulp.lpSum([
-            player_vars[player['id']]
-            for _, player in available_players.iterrows()
-        ]) == self.SQUAD_SIZE
+        bound = 0.0
+        for position, (_, max_count) in self.TEAM_POSITIONS.items():
+            position_points = points[positions == position]
+            bound += float(position_points[top_k_indices(position_points, max_count)].sum())
+        return bound
+    
+    def _build_squad_model(self, data_version: int) -> '_SquadModel':
+        """Build the squad model over the currently available players; the data version only keys the cache"""
+        return _SquadModel(
+            self.analyzer.players_df,
+            self.analyzer.selectable_mask,
+            self.SQUAD_SIZE,
+            self.TEAM_POSITIONS,
+            self.MAX_PLAYERS_PER_TEAM,
+            self.TOTAL_BUDGET
+        )
+    
+    def optimize_transfers(
+        self, 
+        current_squad_ids: List[int], 
+        max_transfers: int, 
+        budget: int, 
+        horizon: int = 5
+    ) -> Dict:
+        """
+        Find the best squad reachable from the current one with at most
+        max_transfers like-for-like transfers, solved as a single MILP.
+        Replacements are drawn from available players outside the squad.
         
-        # Constraint 2: Budget
-        prob += pulp.lpSum([
-            player_vars[player['id']] * player['now_cost']
-            for _, player in available_players.iterrows()
-        ]) <= budget
+        Args:
+            current_squad_ids: Player IDs in the current squad
+            max_transfers: Maximum number of players to replace
+            budget: Budget in tenths for the resulting squad
+            horizon: Number of gameweeks to optimize for
+            
+        Returns:
+            Dictionary with (out_id, in_id) transfer pairs and the solver status
+        """
+        players_df = self.analyzer.players_df
+        in_squad = self.analyzer.player_table.row_mask(current_squad_ids)
+        pool = in_squad | self.analyzer.available_mask
         
-        # Constraint 3: Position requirements
-        for position, (min_count, max_count) in self.TEAM_POSITIONS.items():
-            position_players = available_players[available_players['element_type'] == position]
-            prob += pulp.lpSum([
-                player_vars[player['id']]
-                for _, player in position_players.iterrows()
-            ]) >= min_count
-            prob += pulp.lpSum([
-                player_vars[player['id']]
-                for _, player in position_players.iterrows()
-            ]) <= max_count
+        ids = players_df['id'].to_numpy()[pool]
+        costs = players_df['now_cost'].to_numpy()[pool]
+        positions = players_df['element_type'].to_numpy()[pool]
+        teams = players_df['team'].to_numpy()[pool]
+        points = self.analyzer.get_expected_points(horizon)[pool]
+        current = in_squad[pool]
         
-        # Constraint 4: Max players per team
-        for team_id in available_players['team'].unique():
-            team_players = available_players[available_players['team'] == team_id]
-            prob += pulp.lpSum([
-                player_vars[player['id']]
-                for _, player in team_players.iterrows()
-            ]) <= self.MAX_PLAYERS_PER_TEAM
-        
-        # Solve the problem
-        prob.solve(pulp.PULP_CBC_CMD(msg=0))
-        
-        # Extract selected players
-        selected_players = []
-        total_cost = 0
-        total_expected_points = 0
-        
-        for _, player in available_players.iterrows():
-            if player_vars[player['id']].varValue == 1:
-                selected_players.append({
-                    'id': player['id'],
-                    'name': player['web_name'],
-                    'team': player['team_name'],
-                    'position': player['element_type'],
-                    'cost': player['now_cost'] / 10,
-                    'expected_points': player['expected_points']
-                })
-                total_cost += player['now_cost']
-                total_expected_points += player['expected_points']
+        prob = pulp.LpProblem("FPL_Transfers", pulp.LpMaximize)
+        player_vars = [pulp.LpVariable(f"player_{player_id}", cat='Binary') for player_id in ids.tolist()]
+        current_vars = [player_vars[i] for i in np.flatnonzero(current)]
+        
+        # Expressions are built straight from (variable, coefficient) pairs,
+        # which skips lpSum's term-by-term expression arithmetic
+        def count(variables: List[pulp.LpVariable]) -> pulp.LpAffineExpression:
+            return pulp.LpAffineExpression((var, 1) for var in variables)
+        
+        # Objective: maximize squad expected points; the small bonus for keeping
+        # a player rules out swaps that gain nothing
+        objective = points + self.TRANSFER_TIE_BREAK * current
+        prob += pulp.LpAffineExpression(zip(player_vars, objective.tolist()))
+        
+        # At most max_transfers current players leave the squad
+        prob += count(current_vars) >= len(current_vars) - max_transfers
+        
+        # Current squad counts per position and per team, looked up by id below
+        position_counts = np.bincount(positions[current], minlength=max(self.TEAM_POSITIONS) + 1)
+        team_counts = np.bincount(teams[current], minlength=int(teams.max(initial=0)) + 1)
+        
+        # Transfers are like-for-like, so each position keeps its current count
+        for position in self.TEAM_POSITIONS:
+            position_vars = [player_vars[i] for i in np.flatnonzero(positions == position)]
+            prob += count(position_vars) == int(position_counts[position])
+        
+        # Budget
+        prob += pulp.LpAffineExpression(zip(player_vars, costs.tolist())) <= budget
+        
+        # Max players per team (never tighter than the current squad already is)
+        for team_id in pd.unique(teams):
+            team_vars = [player_vars[i] for i in np.flatnonzero(teams == team_id)]
+            limit = max(self.MAX_PLAYERS_PER_TEAM, int(team_counts[team_id]))
+            prob += count(team_vars) <= limit
+        
+        prob.solve(self.solver)
+        
+        selected = solution_mask(player_vars)
+        transfers = []
+        if prob.status == pulp.LpStatusOptimal:
+            # Pair outgoing and incoming players within each position,
+            # weakest out with strongest in
+            for position in self.TEAM_POSITIONS:
+                at_position = positions == position
+                out = np.flatnonzero(at_position & current & ~selected)
+                into = np.flatnonzero(at_position & ~current & selected)
+                out = out[np.argsort(points[out], kind='stable')]
+                into = into[np.argsort(-points[into], kind='stable')]
+                transfers.extend(zip(out.tolist(), into.tolist()))
+            # Biggest gains first
+            transfers.sort(key=lambda pair: points[pair[0]] - points[pair[1]])
+            transfers = [(int(ids[out]), int(ids[into])) for out, into in transfers]
         
         return {
-            'players': sorted(selected_players, key=lambda x: (x['position'], -x['expected_points'])),
-            'total_cost': total_cost / 10,
-            'remaining_budget': (budget - total_cost) / 10,
-            'total_expected_points': total_expected_points,
+            'transfers': transfers,
             'status': pulp.LpStatus[prob.status]
         }
     
     def optimize_starting_xi(self, squad_player_ids: List[int]) -> Dict:
         """
         Select the best starting 11 from a squad of 15 players.
+        Results are memoized per squad and gameweek.
         
         Args:
             squad_player_ids: List of player IDs in the squad
@@ -150,68 +349,65 @@ class TeamOptimizer:
         Returns:
             Dictionary containing starting XI and bench
         """
-        # Get player data for the squad
-        squad_df = self.analyzer.players_df[
-            self.analyzer.players_df['id'].isin(squad_player_ids)
-        ].copy()
-        
-        # Calculate expected points for next gameweek
-        squad_df['expected_points'] = squad_df['id'].apply(
-            lambda x: self.analyzer.calculate_expected_points(x, 1)
+        return self._optimize_starting_xi_cached(
+            frozenset(squad_player_ids),
+            self.analyzer.current_gw,
+            self.analyzer.data_version
         )
+    
+    def _optimize_starting_xi(self, squad_key: frozenset, current_gw: int, data_version: int) -> Dict:
+        """Uncached starting XI selection; the gameweek and data version only key the cache"""
+        # Get player data for the squad as flat columns, without copying the frame
+        players_df = self.analyzer.players_df
+        in_squad = self.analyzer.player_table.row_mask(squad_key)
         
-        # Create the optimization problem
-        prob = pulp.LpProblem("FPL_Starting_XI", pulp.LpMaximize)
+        ids = players_df['id'].to_numpy()[in_squad]
+        positions = players_df['element_type'].to_numpy()[in_squad]
         
-        # Decision variables
-        player_vars = {}
-        for idx, player in squad_df.iterrows():
-            player_vars[player['id']] = pulp.LpVariable(
-                f"start_{player['id']}", 
-                cat='Binary'
-            )
+        # Expected points for next gameweek
+        points = self.analyzer.get_expected_points(1)[in_squad]
+        
+        # Best players first within each position (ties keep squad order)
+        order = np.argsort(-points, kind='stable')
+        by_position = {
+            position: order[positions[order] == position] for position in self.FORMATION_CONSTRAINTS
+        }
+        # Points from starting the top k players of each position, for every k
+        top_k_points = {
+            position: np.concatenate(([0.0], np.cumsum(points[ranked])))
+            for position, ranked in by_position.items()
+        }
+        
+        # The best XI is the top players of each position under the best legal formation
+        best_total, best_formation = None, None
+        for formation in self.formations:
+            if any(count > len(by_position[position]) for position, count in formation.items()):
+                continue
+            total = sum(top_k_points[position][count] for position, count in formation.items())
+            if best_total is None or total > best_total:
+                best_total, best_formation = total, formation
         
-        # Objective: maximize expected points
-        prob += pulp.lpSum([
-            player_vars[player['id']] * player['expected_points']
-            for _, player in squad_df.iterrows()
-        ])
-        
-        # Constraint 1: Exactly 11 players
-        prob += pulp.lpSum([
-            player_vars[player['id']]
-            for _, player in squad_df.iterrows()
-        ]) == self.STARTING_XI_SIZE
-        
-        # Constraint 2: Formation requirements (1 GK, 3-5 DEF, 2-5 MID, 1-3 FWD)
-        for position, (min_count, max_count) in self.FORMATION_CONSTRAINTS.items():
-            position_players = squad_df[squad_df['element_type'] == position]
-            prob += pulp.lpSum([
-                player_vars[player['id']]
-                for _, player in position_players.iterrows()
-            ]) >= min_count
-            prob += pulp.lpSum([
-                player_vars[player['id']]
-                for _, player in position_players.iterrows()
-            ]) <= max_count
-        
-        # Solve the problem
-        prob.solve(pulp.PULP_CBC_CMD(msg=0))
+        in_xi = np.zeros(len(ids), dtype=bool)
+        if best_formation is not None:
+            for position, count in best_formation.items():
+                in_xi[by_position[position][:count]] = True
         
         # Extract results
         starting_xi = []
         bench = []
         
-        for _, player in squad_df.iterrows():
+        names = players_df['web_name'].to_numpy()[in_squad]
+        team_names = players_df['team_name'].to_numpy()[in_squad]
+        for i in range(len(ids)):
             player_info = {
-                'id': player['id'],
-                'name': player['web_name'],
-                'team': player['team_name'],
-                'position': player['element_type'],
-                'expected_points': player['expected_points']
+                'id': ids[i],
+                'name': names[i],
+                'team': team_names[i],
+                'position': positions[i],
+                'expected_points': points[i]
             }
             
-            if player_vars[player['id']].varValue == 1:
+            if in_xi[i]:
                 starting_xi.append(player_info)
             else:
                 bench.append(player_info)
@@ -1,21 +1,115 @@
 """
 Transfer Suggester - Recommends optimal transfers for your FPL team
 """
-import pulp
-import pandas as pd
+import numpy as np
+import requests
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from fpl_api import FPLApi
 from player_analyzer import PlayerAnalyzer
 from team_optimizer import TeamOptimizer
 
 
+def undominated(
+    cost: np.ndarray, 
+    points: np.ndarray, 
+    position: np.ndarray, 
+    team: np.ndarray
+) -> np.ndarray:
+    """
+    Mask of candidates not dominated by another of the same position and team.
+    A candidate dominates another when it costs no more and ranks higher: more
+    expected points, or equal points and earlier in the input. A dominated
+    candidate is never the first best swap, since its dominator is feasible
+    wherever it is and gains at least as much.
+    """
+    n = len(cost)
+    rank = np.empty(n, dtype=np.intp)
+    rank[np.lexsort((np.arange(n), -points))] = np.arange(n)
+    
+    # Sort by (position, team, cost, rank) and sweep each group keeping new best ranks;
+    # offsetting later groups below earlier ones restarts the running minimum
+    order = np.lexsort((rank, cost, team, position))
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (position[order][1:] != position[order][:-1]) | (team[order][1:] != team[order][:-1])
+    key = rank[order] - np.cumsum(new_group) * n
+    
+    keep = np.zeros(n, dtype=bool)
+    keep[order] = key == np.minimum.accumulate(key)
+    return keep
+
+
+def best_swap(
+    squad_cost: np.ndarray,
+    squad_pts: np.ndarray,
+    squad_pos: np.ndarray,
+    squad_team: np.ndarray,
+    avail_cost: np.ndarray,
+    avail_pts: np.ndarray,
+    avail_pos: np.ndarray,
+    avail_team: np.ndarray,
+    budget_slack: int,
+    transfer_cost: int,
+    max_per_team: int = 3
+) -> Optional[Tuple[int, int, float]]:
+    """
+    Find the best like-for-like swap of one squad player for one candidate.
+    Candidates are split into per-position blocks once; each block is scored
+    against the squad players of that position as a small matrix, with
+    pairings that break the budget or team limits masked out.
+    
+    Returns:
+        (squad index, candidate index, points gain net of transfer_cost) for the
+        first best pairing in squad-major order, or None if no pairing gains
+        more than transfer_cost
+    """
+    # Team limit; replacing a teammate frees a slot
+    num_teams = int(max(squad_team.max(initial=0), avail_team.max(initial=0))) + 1
+    team_counts = np.bincount(squad_team, minlength=num_teams)
+    team_full = team_counts[avail_team] >= max_per_team
+    
+    best = None
+    for position in np.unique(squad_pos).tolist():
+        squad_rows = np.flatnonzero(squad_pos == position)
+        candidates = np.flatnonzero(avail_pos == position)
+        if not candidates.size:
+            continue
+        
+        # Replacements must fit the remaining budget
+        cost_diff = avail_cost[candidates][None, :] - squad_cost[squad_rows][:, None]
+        pts_gain = avail_pts[candidates][None, :] - squad_pts[squad_rows][:, None] - transfer_cost
+        feasible = cost_diff <= budget_slack
+        feasible &= ~team_full[candidates][None, :] | (
+            avail_team[candidates][None, :] == squad_team[squad_rows][:, None]
+        )
+        feasible &= ~np.isnan(pts_gain)
+        
+        gains = np.where(feasible, pts_gain, -np.inf)
+        i, j = np.unravel_index(np.argmax(gains), gains.shape)
+        # Blocks hold ascending indices, so ties go to the earlier squad player
+        candidate = (float(gains[i, j]), -int(squad_rows[i]), -int(candidates[j]))
+        if best is None or candidate > best:
+            best = candidate
+    
+    if best is None or not best[0] > -transfer_cost:
+        return None
+    gain, i, j = best
+    return -i, -j, gain
+
+
 class TransferSuggester:
     """Suggests optimal transfers considering constraints and costs"""
     
+    # Failures fetching or reading a team's picks: network and HTTP errors,
+    # malformed or missing JSON, and invalid team IDs
+    FETCH_ERRORS = (requests.RequestException, KeyError, TypeError, ValueError)
+    
     def __init__(self, api: FPLApi, analyzer: PlayerAnalyzer, optimizer: TeamOptimizer):
         self.api = api
         self.analyzer = analyzer
         self.optimizer = optimizer
+        self._suggest_transfers_cached = lru_cache(maxsize=256)(self._suggest_transfers)
+        self._evaluate_wildcard_cached = lru_cache(maxsize=256)(self._evaluate_wildcard)
         
     def suggest_transfers(
         self, 
@@ -23,10 +117,12 @@ class TransferSuggester:
         num_transfers: int = 1,
         horizon: int = 5,
         free_transfers: int = 1,
-        bank: float = 0.0
+        bank: float = 0.0,
+        picks_data: Optional[Dict] = None
     ) -> Dict:
         """
         Suggest optimal transfers for a team.
+        Results are memoized per squad, settings and data load.
         
         Args:
             team_id: FPL team ID
@@ -34,133 +130,134 @@ class TransferSuggester:
             horizon: Number of gameweeks to optimize for
             free_transfers: Number of free transfers available
             bank: Money in the bank (ITB)
+            picks_data: The team's current picks, if already fetched
             
         Returns:
             Dictionary with transfer suggestions
         """
         # Get current team
         try:
-            current_gw = self.api.get_current_gameweek()
-            picks_data = self.api.get_team_picks(team_id, current_gw)
-            current_squad = [pick['element'] for pick in picks_data['picks']]
-        except:
+            current_squad = self._get_current_squad(team_id, picks_data)
+        except self.FETCH_ERRORS:
             return {
                 'error': 'Could not fetch team data. Please check team ID.',
                 'transfers': []
             }
         
-        # Get current squad data
-        current_squad_df = self.analyzer.players_df[
-            self.analyzer.players_df['id'].isin(current_squad)
-        ].copy()
-        
-        # Calculate current squad value and expected points
-        current_squad_df['expected_points'] = current_squad_df['id'].apply(
-            lambda x: self.analyzer.calculate_expected_points(x, horizon)
+        return self._suggest_transfers_cached(
+            frozenset(current_squad),
+            num_transfers,
+            horizon,
+            free_transfers,
+            int(round(bank * 10)),
+            self.analyzer.current_gw,
+            self.analyzer.data_version
         )
+    
+    def _get_current_squad(self, team_id: int, picks_data: Optional[Dict]) -> List[int]:
+        """
+        Player IDs in a team's current picks, fetching them unless given.
+        Raises one of FETCH_ERRORS on failure.
+        """
+        if picks_data is None:
+            if team_id <= 0:
+                raise ValueError(f"Invalid team ID: {team_id}")
+            current_gw = self.api.get_current_gameweek()
+            picks_data = self.api.get_team_picks(team_id, current_gw)
+        return [pick['element'] for pick in picks_data['picks']]
+    
+    def _suggest_transfers(
+        self, 
+        squad_key: frozenset, 
+        num_transfers: int, 
+        horizon: int, 
+        free_transfers: int, 
+        bank: int, 
+        current_gw: int, 
+        data_version: int
+    ) -> Dict:
+        """
+        Uncached transfer suggestion with the bank in tenths; the gameweek and
+        data version only key the cache
+        """
+        # Squad and candidate IDs in ascending order, with expected points read
+        # from the analyzer's row-aligned table through each player's row
+        table = self.analyzer.player_table
+        expected_points = self.analyzer.get_expected_points(horizon)
+        squad_ids = table.known_ids(squad_key)
+        squad_xp = expected_points[table.row[squad_ids]]
         
-        current_value = current_squad_df['now_cost'].sum()
-        available_budget = current_value + (bank * 10)
+        # Money is kept in integer tenths of a million, like now_cost
+        current_value = int(table.now_cost[squad_ids].sum())
+        available_budget = current_value + bank
         
         # Calculate transfer cost
         transfer_cost = max(0, num_transfers - free_transfers) * 4  # 4 points per extra transfer
         
         # Get all available players
-        all_players_df = self.analyzer.players_df[
-            (self.analyzer.players_df['status'] == 'a') &
-            (~self.analyzer.players_df['id'].isin(current_squad))
-        ].copy()
-        
-        all_players_df['expected_points'] = all_players_df['id'].apply(
-            lambda x: self.analyzer.calculate_expected_points(x, horizon)
-        )
+        candidates = self.analyzer.available_mask & ~table.row_mask(squad_ids)
+        candidate_ids = self.analyzer.players_df['id'].to_numpy()[candidates]
+        candidate_xp = expected_points[table.row[candidate_ids]]
         
         # Find best transfers
         if num_transfers == 1:
             transfers = self._find_single_transfer(
-                current_squad_df, all_players_df, available_budget, transfer_cost
+                squad_ids, squad_xp, candidate_ids, candidate_xp, available_budget, transfer_cost
             )
         else:
             transfers = self._find_multiple_transfers(
-                current_squad_df, all_players_df, available_budget, 
-                num_transfers, transfer_cost
+                squad_ids, squad_xp, candidate_ids, candidate_xp, available_budget, 
+                num_transfers, transfer_cost, horizon
             )
         
         return transfers
     
     def _find_single_transfer(
         self, 
-        current_squad: pd.DataFrame, 
-        available_players: pd.DataFrame,
+        squad_ids: np.ndarray, 
+        squad_xp: np.ndarray,
+        candidate_ids: np.ndarray,
+        candidate_xp: np.ndarray,
         budget: int,
         transfer_cost: int
     ) -> Dict:
         """Find the best single transfer"""
-        best_transfer = None
-        best_improvement = -transfer_cost  # Account for transfer cost
+        table = self.analyzer.player_table
+        squad_cost = table.now_cost[squad_ids]
+        avail_cost = table.now_cost[candidate_ids]
+        avail_pos = table.element_type[candidate_ids]
+        avail_team = table.team[candidate_ids]
         
-        for _, current_player in current_squad.iterrows():
-            position = current_player['element_type']
-            current_team = current_player['team']
-            
-            # Find potential replacements in same position
-            replacements = available_players[
-                available_players['element_type'] == position
-            ]
-            
-            for _, new_player in replacements.iterrows():
-                # Check if we can afford this transfer
-                cost_diff = new_player['now_cost'] - current_player['now_cost']
-                if cost_diff > budget - current_squad['now_cost'].sum():
-                    continue
-                
-                # Check team constraint (max 3 per team)
-                if new_player['team'] == current_team:
-                    # Same team, no issue
-                    pass
-                else:
-                    # Check if adding this player would exceed 3 from their team
-                    team_count = (current_squad['team'] == new_player['team']).sum()
-                    if team_count >= 3:
-                        continue
-                
-                # Calculate improvement
-                points_improvement = (
-                    new_player['expected_points'] - 
-                    current_player['expected_points'] - 
-                    transfer_cost
-                )
-                
-                if points_improvement > best_improvement:
-                    best_improvement = points_improvement
-                    best_transfer = {
-                        'out': {
-                            'id': current_player['id'],
-                            'name': current_player['web_name'],
-                            'team': current_player['team_name'],
-                            'position': current_player['element_type'],
-                            'cost': current_player['now_cost'] / 10,
-                            'expected_points': current_player['expected_points']
-                        },
-                        'in': {
-                            'id': new_player['id'],
-                            'name': new_player['web_name'],
-                            'team': new_player['team_name'],
-                            'position': new_player['element_type'],
-                            'cost': new_player['now_cost'] / 10,
-                            'expected_points': new_player['expected_points']
-                        },
-                        'cost_change': cost_diff / 10,
-                        'points_improvement': points_improvement
-                    }
+        # Only candidates on the cost / points frontier can be the best swap
+        candidates = np.flatnonzero(undominated(avail_cost, candidate_xp, avail_pos, avail_team))
+        
+        best = best_swap(
+            squad_cost,
+            squad_xp,
+            table.element_type[squad_ids],
+            table.team[squad_ids],
+            avail_cost[candidates],
+            candidate_xp[candidates],
+            avail_pos[candidates],
+            avail_team[candidates],
+            budget - int(squad_cost.sum()),
+            transfer_cost
+        )
         
-        if best_transfer is None:
+        if best is None:
             return {
                 'recommendation': 'No beneficial transfers found',
                 'transfers': [],
                 'expected_improvement': 0
             }
         
+        i, j, best_improvement = best
+        j = candidates[j]
+        best_transfer = self._describe_transfer(
+            squad_ids[i], squad_xp[i], candidate_ids[j], candidate_xp[j]
+        )
+        best_transfer['points_improvement'] = best_improvement
+        
         return {
             'recommendation': f"Transfer out {best_transfer['out']['name']} for {best_transfer['in']['name']}",
             'transfers': [best_transfer],
@@ -169,84 +266,36 @@ class TransferSuggester:
     
     def _find_multiple_transfers(
         self, 
-        current_squad: pd.DataFrame,
-        available_players: pd.DataFrame,
+        squad_ids: np.ndarray, 
+        squad_xp: np.ndarray,
+        candidate_ids: np.ndarray,
+        candidate_xp: np.ndarray,
         budget: int,
         num_transfers: int,
-        transfer_cost: int
+        transfer_cost: int,
+        horizon: int
     ) -> Dict:
-        """Find the best combination of multiple transfers"""
-        # For multiple transfers, we use a greedy approach
-        # In practice, you might want to use more sophisticated optimization
+        """
+        Find the best combination of multiple transfers.
+        All transfers are chosen together in one MILP, so budget and team limits
+        are traded off jointly rather than one swap at a time.
+        """
+        plan = self.optimizer.optimize_transfers(
+            squad_ids.tolist(), num_transfers, budget, horizon
+        )
         
-        transfers = []
-        working_squad = current_squad.copy()
-        remaining_budget = budget
-        total_improvement = -transfer_cost
+        # Both ID arrays are sorted, so positions are found by binary search
+        pairs = np.array(plan['transfers'], dtype=int).reshape(-1, 2)
+        out_xp = squad_xp[np.searchsorted(squad_ids, pairs[:, 0])]
+        in_xp = candidate_xp[np.searchsorted(candidate_ids, pairs[:, 1])]
         
-        for i in range(num_transfers):
-            best_transfer = None
-            best_improvement = 0
-            
-            for _, current_player in working_squad.iterrows():
-                position = current_player['element_type']
-                
-                # Find potential replacements
-                replacements = available_players[
-                    (available_players['element_type'] == position) &
-                    (~available_players['id'].isin([t['in']['id'] for t in transfers]))
-                ]
-                
-                for _, new_player in replacements.iterrows():
-                    # Check affordability
-                    cost_diff = new_player['now_cost'] - current_player['now_cost']
-                    new_total = working_squad['now_cost'].sum() + cost_diff
-                    if new_total > remaining_budget:
-                        continue
-                    
-                    # Check team constraint
-                    temp_squad = working_squad[working_squad['id'] != current_player['id']]
-                    team_count = (temp_squad['team'] == new_player['team']).sum()
-                    if team_count >= 3:
-                        continue
-                    
-                    # Calculate improvement (no additional transfer cost for subsequent transfers)
-                    points_improvement = new_player['expected_points'] - current_player['expected_points']
-                    
-                    if points_improvement > best_improvement:
-                        best_improvement = points_improvement
-                        best_transfer = {
-                            'out': {
-                                'id': current_player['id'],
-                                'name': current_player['web_name'],
-                                'team': current_player['team_name'],
-                                'position': current_player['element_type'],
-                                'cost': current_player['now_cost'] / 10,
-                                'expected_points': current_player['expected_points']
-                            },
-                            'in': {
-                                'id': new_player['id'],
-                                'name': new_player['web_name'],
-                                'team': new_player['team_name'],
-                                'position': new_player['element_type'],
-                                'cost': new_player['now_cost'] / 10,
-                                'expected_points': new_player['expected_points']
-                            },
-                            'cost_change': cost_diff / 10,
-                            'points_improvement': points_improvement
-                        }
-            
-            if best_transfer is None:
-                break
-            
-            # Apply the transfer
-            transfers.append(best_transfer)
-            total_improvement += best_improvement
-            
-            # Update working squad
-            working_squad = working_squad[working_squad['id'] != best_transfer['out']['id']]
-            new_row = available_players[available_players['id'] == best_transfer['in']['id']].iloc[0]
-            working_squad = pd.concat([working_squad, new_row.to_frame().T])
+        transfers = [
+            self._describe_transfer(out_id, out_points, in_id, in_points)
+            for out_id, out_points, in_id, in_points in zip(
+                pairs[:, 0], out_xp, pairs[:, 1], in_xp
+            )
+        ]
+        total_improvement = -transfer_cost + (in_xp - out_xp).sum()
         
         return {
             'recommendation': f"Make {len(transfers)} transfer(s)",
@@ -254,58 +303,123 @@ class TransferSuggester:
             'expected_improvement': total_improvement
         }
     
-    def evaluate_wildcard(self, team_id: int, horizon: int = 5) -> Dict:
+    def _describe_transfer(
+        self, 
+        out_id: int, 
+        out_points: float, 
+        in_id: int, 
+        in_points: float
+    ) -> Dict:
+        """Describe swapping one player for another, read from the player table"""
+        table = self.analyzer.player_table
+        
+        def player(player_id: int, expected_points: float) -> Dict:
+            return {
+                'id': table.id[player_id],
+                'name': table.web_name[player_id],
+                'team': table.team_name[player_id],
+                'position': table.element_type[player_id],
+                'cost': table.now_cost[player_id] / 10,
+                'expected_points': expected_points
+            }
+        
+        return {
+            'out': player(out_id, out_points),
+            'in': player(in_id, in_points),
+            'cost_change': (table.now_cost[in_id] - table.now_cost[out_id]) / 10,
+            'points_improvement': in_points - out_points
+        }
+    
+    def evaluate_wildcard(
+        self, 
+        team_id: int, 
+        horizon: int = 5, 
+        picks_data: Optional[Dict] = None
+    ) -> Dict:
         """
         Evaluate whether using a wildcard is beneficial.
         Compares the best possible team vs current team.
+        Successful results are memoized per squad, horizon and data load.
         
         Args:
             team_id: FPL team ID
             horizon: Number of gameweeks to optimize for
+            picks_data: The team's current picks, if already fetched
             
         Returns:
             Dictionary with wildcard recommendation
         """
+        # Get current team
         try:
-            # Get current team
-            current_gw = self.api.get_current_gameweek()
-            picks_data = self.api.get_team_picks(team_id, current_gw)
-            current_squad = [pick['element'] for pick in picks_data['picks']]
-            
-            # Calculate current team value
-            current_squad_df = self.analyzer.players_df[
-                self.analyzer.players_df['id'].isin(current_squad)
-            ].copy()
-            
-            current_squad_df['expected_points'] = current_squad_df['id'].apply(
-                lambda x: self.analyzer.calculate_expected_points(x, horizon)
-            )
-            
-            current_value = current_squad_df['now_cost'].sum()
-            current_expected = current_squad_df['expected_points'].sum()
-            
-            # Get optimal team with same budget
-            optimal_team = self.optimizer.optimize_squad(budget=current_value, horizon=horizon)
-            
-            improvement = optimal_team['total_expected_points'] - current_expected
-            
-            # Wildcard is worth it if improvement > ~20-30 points over the horizon
-            threshold = 20 if horizon >= 5 else 15
-            
-            return {
-                'recommended': improvement > threshold,
-                'current_expected_points': current_expected,
-                'optimal_expected_points': optimal_team['total_expected_points'],
-                'improvement': improvement,
-                'optimal_team': optimal_team['players'],
-                'reasoning': self._get_wildcard_reasoning(improvement, threshold)
-            }
-            
-        except Exception as e:
+            current_squad = self._get_current_squad(team_id, picks_data)
+        except self.FETCH_ERRORS as e:
             return {
                 'error': f'Could not evaluate wildcard: {str(e)}',
                 'recommended': False
             }
+        
+        return self.evaluate_squad_wildcard(current_squad, horizon)
+    
+    def evaluate_squad_wildcard(self, squad_player_ids: List[int], horizon: int = 5) -> Dict:
+        """
+        Evaluate a wildcard for a squad given by its player IDs.
+        Results are memoized per squad, horizon and data load.
+        """
+        return self._evaluate_wildcard_cached(
+            frozenset(squad_player_ids),
+            horizon,
+            self.analyzer.current_gw,
+            self.analyzer.data_version
+        )
+    
+    def _evaluate_wildcard(
+        self, 
+        squad_key: frozenset, 
+        horizon: int, 
+        current_gw: int, 
+        data_version: int
+    ) -> Dict:
+        """Uncached wildcard evaluation; the gameweek and data version only key the cache"""
+        # Calculate current team value straight from the id-indexed table
+        table = self.analyzer.player_table
+        squad_ids = table.known_ids(squad_key)
+        
+        current_value = int(table.now_cost[squad_ids].sum())
+        current_expected = float(
+            self.analyzer.get_expected_points(horizon)[table.row[squad_ids]].sum()
+        )
+        
+        # Wildcard is worth it if improvement > ~20-30 points over the horizon
+        threshold = 20 if horizon >= 5 else 15
+        
+        # Skip the squad MILP when even an unconstrained squad falls below the
+        # marginal band, so the exact improvement would get the same verdict;
+        # the optimum is then unknown and only the bound is reported
+        max_improvement = self.optimizer.squad_points_upper_bound(horizon) - current_expected
+        if max_improvement <= threshold * 0.7:
+            return {
+                'recommended': False,
+                'current_expected_points': current_expected,
+                'optimal_expected_points': None,
+                'improvement': None,
+                'improvement_upper_bound': max_improvement,
+                'optimal_team': None,
+                'reasoning': self._get_wildcard_reasoning(max_improvement, threshold)
+            }
+        
+        # Get optimal team with same budget
+        optimal_team = self.optimizer.optimize_squad(budget=current_value, horizon=horizon)
+        
+        improvement = optimal_team['total_expected_points'] - current_expected
+        
+        return {
+            'recommended': improvement > threshold,
+            'current_expected_points': current_expected,
+            'optimal_expected_points': optimal_team['total_expected_points'],
+            'improvement': improvement,
+            'optimal_team': optimal_team['players'],
+            'reasoning': self._get_wildcard_reasoning(improvement, threshold)
+        }
     
     def _get_wildcard_reasoning(self, improvement: float, threshold: float) -> str:
         """Generate reasoning for wildcard recommendation"""
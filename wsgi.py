@@ -0,0 +1,19 @@
+"""
+WSGI entrypoint for production servers.
+
+Run with gunicorn's --preload so FPL data is loaded once in the master
+process and shared copy-on-write with every forked worker:
+
+    gunicorn --preload -k gthread --threads 4 --workers 4 wsgi:app
+"""
+import app as web
+
+try:
+    web.initialize_components()
+except Exception as e:
+    print(f"Could not preload FPL data ({e}); it will be loaded on the first request")
+else:
+    # Don't let forked workers share the master's pooled sockets
+    web.api.session.close()
+
+app = web.app